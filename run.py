@@ -2,23 +2,42 @@ import os
 import sys
 import pathlib
 from argparse import Namespace
+from logging import Logger
 from datetime import datetime
-from typing import Union, Tuple
+from typing import Union, Tuple, Optional
 from src.portfolio_mngr import Portfolio
-from src.market_mngr import MarketDataYahoo, Interval, MarketSymbol
-from src.cfg_mngr import Directories, ConfigMapUri
+from src.market_mngr import MarketDataFeed, Interval, MarketSymbol
+from src.frame_mngr import Period, get_month_label
+from src.cfg_mngr import Directories, ConfigMapUri, CfgManager
 from src.log_mngr import LogManager
+from src.cache_mngr import PriceCache, TtlCache, CheckpointStore, LedgerCache
+from src.db_mngr import open_database, PortfolioDb, DbPriceCache, DbTtlCache, DbCheckpointStore, DbLedgerCache
+from src.fetch_mngr import FetchEngine
+from src.provider_mngr import create_market_provider
 from src.cfg_mngr import create_cfg
-from src.transactions import build_transactions_object
+from src.transactions import build_transactions_object, get_transactions_file
+from src.sheets_mngr import is_sheet_changed, get_sheet_digest
+from src.import_mngr import load_imports
+from src.fx_mngr import get_fx_ticker
+from src.rollup_mngr import ROLLUP_METRICS
 from src.market_mngr import get_yfinance_map, convertSymbListToDicts, get_yfinance_map_local
 from src.utils import parse_arguments, check_internet, get_exception
-from src.csv_mngr import write_markdown_table, write_csv_lazy
-from src.plot_mngr import plot_combined, plot_monthly_stocks
+from src.csv_mngr import write_markdown_table, write_csv_lazy, write_csv_records
+from src.plot_mngr import plot_combined, plot_monthly_stocks, plot_fan_chart
 from src.report_mngr import generate_html_report
+from src.risk_mngr import RiskReport
+from src.optimizer_mngr import PortfolioOptimizer, OptimizationTarget, get_rebalancing_orders
+from src.simulation_mngr import simulate_portfolio, PERCENTILES
 
-def exec(cfg_file: os.PathLike) -> None:
+def raise_input_error(error: Exception, logger: Optional[Logger], is_quiet: bool) -> None:
+    if logger:
+        logger.error(f'{error}')
+    if not is_quiet:
+        print(error)
+    raise Exception("422") from error
+
+def exec(cfg_file: os.PathLike, refresh_cache: Optional[list[str]]=None) -> None:
     cfg = create_cfg(cfg_file)
-    is_quiet = cfg.get_param(ConfigMapUri.QUIET)
     log_level = cfg.get_param(ConfigMapUri.LOG_LEVEL)
     directories = Directories(base_dir=cfg.get_param(ConfigMapUri.GENERATION_DIRECTORY),
                             log_dir=cfg.get_param(ConfigMapUri.LOG_DIRECTORY),
@@ -33,16 +52,66 @@ def exec(cfg_file: os.PathLike) -> None:
         log_manager = LogManager(log_file=f'{directories.log_dir}app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log',
                                 log_level=log_level)
         logger = log_manager.get_logger()
-    if not check_internet():
+    database = open_database(cfg.get_param(ConfigMapUri.STORAGE_BACKEND),
+                             cfg.get_param(ConfigMapUri.STORAGE_DATABASE) or directories.database_file)
+    try:
+        exec_portfolio(cfg, directories, logger, database, refresh_cache)
+    finally:
+        if database:
+            database.close()
+
+def exec_portfolio(cfg: CfgManager, directories: Directories, logger: Optional[Logger],
+                   database: Optional[PortfolioDb], refresh_cache: Optional[list[str]]=None) -> None:
+    is_quiet = cfg.get_param(ConfigMapUri.QUIET)
+    price_cache = None
+    quote_cache = None
+    metadata_cache = None
+    if cfg.get_param(ConfigMapUri.PRICE_CACHE) and database:
+        price_cache = DbPriceCache(database, overlap_days=cfg.get_param(ConfigMapUri.PRICE_CACHE_OVERLAP))
+        quote_cache = DbTtlCache(database, 'quotes', ttl=cfg.get_param(ConfigMapUri.QUOTE_TTL))
+        metadata_cache = DbTtlCache(database, 'metadata', ttl=cfg.get_param(ConfigMapUri.METADATA_TTL))
+    elif cfg.get_param(ConfigMapUri.PRICE_CACHE):
+        price_cache = PriceCache(directories.price_cache_dir,
+                                 overlap_days=cfg.get_param(ConfigMapUri.PRICE_CACHE_OVERLAP))
+        quote_cache = TtlCache(directories.quote_cache_file,
+                               ttl=cfg.get_param(ConfigMapUri.QUOTE_TTL))
+        metadata_cache = TtlCache(directories.metadata_cache_file,
+                                  ttl=cfg.get_param(ConfigMapUri.METADATA_TTL))
+    if price_cache and refresh_cache is not None:
+        if refresh_cache:
+            for ticker in refresh_cache:
+                price_cache.invalidate(ticker)
+                quote_cache.invalidate(ticker)
+        else:
+            price_cache.invalidate()
+            quote_cache.invalidate()
+        quote_cache.save()
         if logger:
-            logger.error('Failed to connect.')
+            logger.info(f"Price cache invalidated: {refresh_cache if refresh_cache else 'all'}")
+    provider = create_market_provider(cfg.get_param(ConfigMapUri.MARKET_ORIGIN),
+                                      fetch_mode=cfg.get_param(ConfigMapUri.FETCH_MODE),
+                                      fetch_engine=FetchEngine(workers=cfg.get_param(ConfigMapUri.FETCH_WORKERS),
+                                                               rate_limit=cfg.get_param(ConfigMapUri.FETCH_RATE_LIMIT),
+                                                               retries=cfg.get_param(ConfigMapUri.FETCH_RETRIES),
+                                                               timeout=cfg.get_param(ConfigMapUri.FETCH_TIMEOUT)),
+                                      metadata_cache=metadata_cache,
+                                      directory=cfg.get_param(ConfigMapUri.MARKET_DIRECTORY),
+                                      fixture_file=cfg.get_param(ConfigMapUri.MARKET_FIXTURE),
+                                      record_file=cfg.get_param(ConfigMapUri.MARKET_RECORD))
+    requires_network = provider.requires_network \
+        or cfg.get_param(ConfigMapUri.TRANSACTIONS_SOURCE) == 'cloud' \
+        or cfg.get_param(ConfigMapUri.SYMBOLS_MAP_SOURCE) == 'cloud'
+    if requires_network:
+        if not check_internet():
+            if logger:
+                logger.error('Failed to connect.')
+            if not is_quiet:
+                print("Failed to connect.")
+            raise Exception("503")
         if not is_quiet:
-            print("Failed to connect.")
-        raise Exception("503")
-    if not is_quiet:
-        print("Connection exists.")
-    if logger:
-        logger.info('Connection exists.')
+            print("Connection exists.")
+        if logger:
+            logger.info('Connection exists.')
     if cfg.get_param(ConfigMapUri.TRANSACTIONS_SOURCE) == 'cloud':
         trans_sheets = cfg.get_param(ConfigMapUri.TRANSACTIONS_SHEET)
     else:
@@ -53,29 +122,74 @@ def exec(cfg_file: os.PathLike) -> None:
         logger.info('Configuration retrieved.')
     yfinance_map_obj = None
     if cfg.get_param(ConfigMapUri.SYMBOLS_STANDARD) == 'custom':
-        if cfg.get_param(ConfigMapUri.SYMBOLS_MAP_SOURCE) == 'cloud':
-            yfinance_map_obj = get_yfinance_map(cfg.get_param(ConfigMapUri.SYMBOLS_MAP_SHEET),
-                                                f'{directories.sheets_dir}')
-        else:
-            yfinance_map_obj = get_yfinance_map_local(cfg.get_param(ConfigMapUri.SYMBOLS_MAP_DIRECTORY))
+        try:
+            if cfg.get_param(ConfigMapUri.SYMBOLS_MAP_SOURCE) == 'cloud':
+                yfinance_map_obj = get_yfinance_map(cfg.get_param(ConfigMapUri.SYMBOLS_MAP_SHEET),
+                                                    f'{directories.sheets_dir}')
+            else:
+                yfinance_map_obj = get_yfinance_map_local(cfg.get_param(ConfigMapUri.SYMBOLS_MAP_DIRECTORY))
+        except ValueError as error:
+            raise_input_error(error, logger, is_quiet)
         if not is_quiet:
             print("Yahoo Finance Ticker map:")
             print(yfinance_map_obj.tickerMap)
         if logger:
             logger.info("Ticker map built.")
-    transactions_obj = build_transactions_object(True if cfg.get_param(ConfigMapUri.TRANSACTIONS_SOURCE) == 'local' else False,
-                                                 trans_sheets,
-                                                 f'{directories.sheets_dir}',
-                                                 is_quiet, yfinance_map_obj.tickerMap)
+    imports = cfg.get_param(ConfigMapUri.TRANSACTIONS_IMPORTS)
+    std_map = yfinance_map_obj.tickerMap if yfinance_map_obj else None
+    transactions_file = get_transactions_file(True if cfg.get_param(ConfigMapUri.TRANSACTIONS_SOURCE) == 'local' else False,
+                                              trans_sheets, f'{directories.sheets_dir}')
+    if cfg.get_param(ConfigMapUri.TRANSACTIONS_SOURCE) == 'cloud':
+        sheet_message = f'CSV file saved to: {transactions_file}' if is_sheet_changed(transactions_file) \
+            else f'CSV file unchanged: {transactions_file}'
+        if not is_quiet:
+            print(sheet_message)
+        if logger:
+            logger.info(sheet_message)
+    transactions_obj = None
+    ledger_cache = None
+    ledger_key = None
+    if cfg.get_param(ConfigMapUri.LEDGER_CACHE):
+        ledger_cache = DbLedgerCache(database) if database else LedgerCache(directories.ledger_cache_dir)
+    if ledger_cache:
+        ledger_key = LedgerCache.get_key([transactions_file] + [entry['path'] for entry in imports],
+                                         imports, std_map,
+                                         digests={f'{transactions_file}': get_sheet_digest(f'{transactions_file}')})
+        transactions_obj = ledger_cache.load(ledger_key)
+        if transactions_obj and not is_quiet:
+            for error in transactions_obj.errors:
+                print(f'Skipped transaction at {error}')
+        if transactions_obj and logger:
+            logger.info("Transactions loaded from ledger cache.")
+    if transactions_obj is None:
+        try:
+            transactions_obj = build_transactions_object(True, transactions_file, None, is_quiet, std_map,
+                                                         load_imports(imports))
+        except (ValueError, OSError) as error:
+            raise_input_error(error, logger, is_quiet)
+        if ledger_cache:
+            ledger_cache.save(ledger_key, transactions_obj)
     if not is_quiet:
         transactions_obj.print()
     if logger:
+        for error in transactions_obj.errors:
+            logger.warning(f"Skipped transaction at {error}")
         logger.info("Transactions retrieved.")
     symbols_of_interest = transactions_obj.get_symbols_of_interest()
-    if yfinance_map_obj:
+    portfolio_symbols = list(symbols_of_interest)
+    if yfinance_map_obj and yfinance_map_obj.tickerMap.get(cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY).lower()):
         symbols_of_interest += [f'{yfinance_map_obj.tickerMap.get(cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY).lower())}']
-    else:
-        symbols_of_interest += [f'{cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY)}']
+    default_currency = cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY).upper()
+    symbols_of_interest += [get_fx_ticker(currency, default_currency)
+                            for currency in transactions_obj.get_cash_currencies()
+                            if currency != default_currency
+                            and get_fx_ticker(currency, default_currency) not in symbols_of_interest]
+    benchmark = cfg.get_param(ConfigMapUri.BENCHMARK)
+    if benchmark and benchmark not in symbols_of_interest:
+        symbols_of_interest += [benchmark]
+    target_allocation = cfg.get_param(ConfigMapUri.TARGET_ALLOCATION)
+    if isinstance(target_allocation, dict):
+        symbols_of_interest += [symbol for symbol in target_allocation if symbol not in symbols_of_interest]
     if not is_quiet:
         print("Symbols of Interest: ", symbols_of_interest)
     if logger:
@@ -84,28 +198,32 @@ def exec(cfg_file: os.PathLike) -> None:
     if history_variant == 'full':
         if not is_quiet:
             print("WARNING! Full history variant is not recommended.")
-    if cfg.get_param(ConfigMapUri.MARKET_ORIGIN) == 'yahoo':
-        start_date = transactions_obj.get_first_transaction_date()
+    start_date = transactions_obj.get_first_transaction_date()
+    if not is_quiet:
+        print("Start Date:", start_date)
+    if logger:
+        logger.info(f"Start date: {start_date}")
+    market = MarketDataFeed(tickers=symbols_of_interest,
+                            ticker_map=yfinance_map_obj,
+                            start_date=start_date,
+                            provider=provider,
+                            interval=Interval.DAILY,
+                            period=Period.MONTH \
+                                if history_variant == 'lite' \
+                                else Period.DAY,
+                            price_cache=price_cache,
+                            quote_cache=quote_cache,
+                            metadata_cache=metadata_cache,
+                            req_currency=cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY))
+    for fetch_error in market.fetch_errors:
         if not is_quiet:
-            print("Start Date:", start_date)
+            print("Failed to fetch:", fetch_error)
         if logger:
-            logger.info(f"Start date: {start_date}")
-        market = MarketDataYahoo(tickers=symbols_of_interest,
-                                 ticker_map=yfinance_map_obj,
-                                 start_date=start_date,
-                                 interval=Interval.WEEKLY \
-                                    if history_variant == 'lite' \
-                                    else Interval.DAILY,
-                                 req_currency=cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY))
-    else:
-        if cfg.get_param(ConfigMapUri.MARKET_ORIGIN)  == 'google':
-            raise Exception("299")
-        else:
-            raise Exception("417")
+            logger.warning(f"Failed to fetch: {fetch_error}")
     symbols_obj_list = []
     for symbol in symbols_of_interest:
         symbol_key = symbol
-        symbols_obj_list.append(MarketSymbol(symbol, market.history[symbol_key],
+        symbols_obj_list.append(MarketSymbol(symbol, market.history,
                                              market.current_price[symbol_key],
                                              market.currency[symbol_key]))
     if not is_quiet:
@@ -113,13 +231,56 @@ def exec(cfg_file: os.PathLike) -> None:
             symbol.print()
     if logger:
         logger.info("Market data instantiated.")
-    prices_dict, history_dict = convertSymbListToDicts(symbols_obj_list)
-    portfolio = Portfolio(transactions_obj, prices_dict, is_quiet=is_quiet)
+    prices_dict, history_frame = convertSymbListToDicts(symbols_obj_list)
+    checkpoint_store = None
+    if cfg.get_param(ConfigMapUri.CHECKPOINT):
+        checkpoint_store = DbCheckpointStore(database) if database else CheckpointStore(directories.checkpoint_file)
+    portfolio = Portfolio(transactions_obj, prices_dict, is_quiet=is_quiet,
+                          lot_policy=cfg.get_param(ConfigMapUri.LOT_POLICY),
+                          checkpoint_store=checkpoint_store,
+                          ledger_key=ledger_key)
     portfolio_dict, total_dict = portfolio.calculate()
     if logger:
-        logger.info("Portfolio calculated.")
+        logger.info(f"Portfolio calculated ({'unchanged' if portfolio.is_unchanged else 'incremental' if portfolio.is_incremental else 'full rebuild'}).")
         logger.info("Total computed.")
-    historical_valuation = portfolio.compute_historical_valuation(history_dict)
+    nav = portfolio.compute_nav(market.daily, default_currency)
+    for currency in portfolio.cash.unvalued:
+        if not is_quiet:
+            print("Cash not valued:", currency)
+        if logger:
+            logger.warning(f"Cash not valued: {currency}")
+    portfolio.compute_returns(cfg.get_param(ConfigMapUri.RETURN_WINDOWS))
+    risk = RiskReport(market.daily, portfolio_symbols, benchmark,
+                      int(cfg.get_param(ConfigMapUri.RISK_WINDOW)),
+                      float(cfg.get_param(ConfigMapUri.RISK_FREE_RATE)))
+    risk_dict = risk.to_dict()
+    optimizer = PortfolioOptimizer(market.daily, list(portfolio_dict), float(cfg.get_param(ConfigMapUri.WEIGHT_CAP)),
+                                   float(cfg.get_param(ConfigMapUri.RISK_FREE_RATE)))
+    allocation_dict, frontier_rows, rebalance_orders = {}, [], []
+    if len(optimizer.symbols) > 1:
+        frontier_rows = optimizer.frontier(int(cfg.get_param(ConfigMapUri.FRONTIER_POINTS)))
+        min_variance = optimizer.get_target(OptimizationTarget.MIN_VARIANCE)
+        max_sharpe = optimizer.get_target(OptimizationTarget.MAX_SHARPE)
+        allocation_dict = {symbol: {'current': portfolio_dict[symbol]['value'] / total_dict['value'] * 100
+                                    if total_dict['value'] else 0.0,
+                                    'min_variance': min_variance[symbol] * 100,
+                                    'max_sharpe': max_sharpe[symbol] * 100}
+                           for symbol in optimizer.symbols}
+    target = optimizer.get_target(target_allocation) if target_allocation else {}
+    if target:
+        rebalance_orders = get_rebalancing_orders(portfolio_dict, target,
+                                                  {symbol: market.daily.get_last_price(symbol)
+                                                   for symbol in target if market.daily.has_symbol(symbol)})
+    if logger and allocation_dict:
+        logger.info("Allocation optimized.")
+    projection = simulate_portfolio(market.daily, nav, int(cfg.get_param(ConfigMapUri.SIMULATION_PATHS)),
+                                    float(cfg.get_param(ConfigMapUri.SIMULATION_YEARS)),
+                                    cfg.get_param(ConfigMapUri.SIMULATION_METHOD),
+                                    int(cfg.get_param(ConfigMapUri.SIMULATION_SEED)),
+                                    int(cfg.get_param(ConfigMapUri.SIMULATION_WORKERS)))
+    if logger and projection:
+        logger.info(f"Projection simulated ({projection.paths} paths).")
+    historical_valuation = portfolio.compute_historical_valuation(market.daily)
     entry_points = portfolio.get_entry_points_months()
     if logger:
         logger.info("History valuated.")
@@ -139,6 +300,40 @@ def exec(cfg_file: os.PathLike) -> None:
                          'Metric', 'Value', total_dict)
     write_markdown_table(pathlib.Path(f'{directories.gen_entries_file}'), 'Entry Points',
                          'Symbol', 'Date', entry_points)
+    write_csv_records(pathlib.Path(f'{directories.gen_realized_file}'),
+                      ['symbol', 'date', 'quantity', 'proceeds', 'cost', 'pnl', 'holding_days', 'unmatched'],
+                      [trade.__dict__() for trade in portfolio.lot_book.realized])
+    write_csv_records(pathlib.Path(f'{directories.gen_nav_file}'),
+                      ['date', 'nav', 'cost_basis', 'unrealized_pnl', 'cash', 'wealth'], nav.to_rows())
+    write_csv_records(pathlib.Path(f'{directories.gen_rollups_file}'),
+                      ['group', 'name'] + list(ROLLUP_METRICS), portfolio.rollups.to_rows())
+    write_csv_records(pathlib.Path(f'{directories.gen_cash_file}'),
+                      ['date'] + portfolio.cash.currencies + ['cash'], portfolio.cash.to_rows())
+    write_csv_records(pathlib.Path(f'{directories.gen_cash_balances_file}'),
+                      ['wallet', 'currency', 'balance'], portfolio.cash_ledger.get_balance_rows())
+    write_csv_records(pathlib.Path(f'{directories.gen_returns_file}'),
+                      ['symbol', 'window', 'twr', 'xirr'], portfolio.get_returns_rows())
+    if risk_dict:
+        write_csv_lazy(pathlib.Path(f'{directories.gen_risk_file}'), risk_dict, 'symbol')
+        write_csv_lazy(pathlib.Path(f'{directories.gen_correlation_file}'),
+                       risk.get_correlation_dict(), 'symbol')
+        write_csv_records(pathlib.Path(f'{directories.gen_volatility_file}'),
+                          ['date'] + risk.symbols, risk.get_rolling_rows())
+    if allocation_dict:
+        write_csv_lazy(pathlib.Path(f'{directories.gen_allocation_file}'), allocation_dict, 'symbol')
+        write_csv_records(pathlib.Path(f'{directories.gen_frontier_file}'),
+                          ['return', 'volatility', 'sharpe'] + optimizer.symbols, frontier_rows)
+    if target_allocation:
+        write_csv_records(pathlib.Path(f'{directories.gen_rebalance_file}'),
+                          ['symbol', 'side', 'quantity', 'value', 'current_weight', 'target_weight'],
+                          rebalance_orders)
+    if projection:
+        write_csv_records(pathlib.Path(f'{directories.gen_projection_file}'),
+                          ['date'] + [f'p{percentile}' for percentile in PERCENTILES],
+                          projection.to_rows())
+    write_csv_records(pathlib.Path(f'{directories.gen_lots_file}'),
+                      ['symbol', 'date', 'quantity', 'cost', 'unit_cost'],
+                      [lot.__dict__() for lot in portfolio.lot_book.get_open_lots()])
     if not is_quiet:
         print("Files generated.")
     if logger:
@@ -150,7 +345,7 @@ def exec(cfg_file: os.PathLike) -> None:
     if not is_quiet:
         print("Generating plots..")
     figs_paths_stocks = plot_monthly_stocks(fig_path=f'{directories.gen_plots_history}',
-                                     data_dict=history_dict,
+                                     data_frame=history_frame,
                                      entry_points=entry_points)
     figs_paths_stats = plot_combined(fig_path=f'{directories.gen_plots_stats}',
                                     nums_pie=spending_list,
@@ -165,6 +360,11 @@ def exec(cfg_file: os.PathLike) -> None:
                                     points1_title='Valuation Percent',
                                     pie_title='Spending Percent',
                                     bar_title='Profit Percent')
+    projection_fig = plot_fan_chart(fig_path=f'{directories.gen_plots_projection}',
+                                    labels=[get_month_label(day) for day in projection.dates],
+                                    bands=projection.bands,
+                                    title=f'Projection ({projection.paths} paths, {projection.method})') \
+        if projection else None
     if logger:
         logger.info("Plots created.")
     if not is_quiet:
@@ -178,8 +378,16 @@ def exec(cfg_file: os.PathLike) -> None:
                          def_currency=cfg.get_param(ConfigMapUri.DEFAULT_CURRENCY),
                          figs_paths_stocks=figs_paths_stocks[::-1],
                          figs_paths_stats=figs_paths_stats,
-                         transactions_list=transactions_obj.get(),
+                         transactions_list=transactions_obj.get_sorted(),
                          historical_valuation=historical_valuation,
+                         risk_dict=risk_dict,
+                         correlation_dict=risk.get_correlation_dict(),
+                         cash_balances=portfolio.cash_ledger.get_balance_rows(),
+                         rollups_dict=portfolio.rollups.to_dict(),
+                         allocation_dict=allocation_dict,
+                         rebalance_orders=rebalance_orders,
+                         projection_rows=projection.get_yearly_rows() if projection else None,
+                         projection_fig=projection_fig,
                          req_path=f'{directories.base_dir}report.html',
                          sub_dir=f'{directories.generated_dir}')
     if logger:
@@ -190,14 +398,15 @@ def exec(cfg_file: os.PathLike) -> None:
 def run_cli(args: Namespace) -> Union[int, Tuple]:
     cfg_file = args.cfg_file
     try:
-        exec(cfg_file)
+        exec(cfg_file, args.refresh_cache)
     except Exception as e_num:
         return int(e_num.__str__()), get_exception(int(e_num.__str__()))
     return 0
 
-def run_api(cfg_file: os.PathLike) -> Union[int, Tuple]:
+def run_api(cfg_file: os.PathLike,
+            refresh_cache: Optional[list[str]]=None) -> Union[int, Tuple]:
     try:
-        exec(cfg_file)
+        exec(cfg_file, refresh_cache)
     except Exception as e_num:
         return int(e_num.__str__()), get_exception(int(e_num.__str__()))
     return 0
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import pathlib
+import threading
+import numpy as np
+from typing import Any, Iterable, Optional
+from datetime import date, datetime, timedelta
+from src.csv_mngr import CsvMngr, CsvRowError
+from src.transactions import Transactions
+
+LEDGER_VERSION = 2
+
+class PriceCache:
+
+    def __init__(self, cache_dir: os.PathLike, overlap_days: int=5,
+                 date_format: str='%Y-%m-%d') -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.overlap_days = overlap_days
+        self.date_format = date_format
+
+    @staticmethod
+    def get_key(ticker: str, interval: str) -> str:
+        safe_ticker = ''.join(c if c.isalnum() or c in '-_=^.' else '_' for c in ticker)
+        return f'{safe_ticker}_{interval}'
+
+    def get_file(self, ticker: str, interval: str) -> pathlib.Path:
+        return self.cache_dir / interval / f'{self.get_key(ticker, interval)}.csv'
+
+    def load(self, ticker: str, interval: str) -> dict:
+        cache_file = self.get_file(ticker, interval)
+        if not cache_file.exists():
+            return {}
+        return {row['date']: float(row['close'])
+                for row in CsvMngr(cache_file, ['date', 'close']).read()}
+
+    def store(self, ticker: str, interval: str, series: dict) -> None:
+        cache_file = self.get_file(ticker, interval)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix('.tmp')
+        CsvMngr(tmp_file, ['date', 'close']).write(sorted(series.items()))
+        os.replace(tmp_file, cache_file)
+
+    def get_fetch_start(self, ticker: str, interval: str,
+                        start_date: date) -> date:
+        cached = self.load(ticker, interval)
+        if not cached:
+            return start_date
+        first_date = datetime.strptime(min(cached), self.date_format).date()
+        if first_date > start_date + timedelta(days=self.overlap_days):
+            return start_date
+        last_date = datetime.strptime(max(cached), self.date_format).date()
+        return max(start_date, last_date - timedelta(days=self.overlap_days))
+
+    def merge(self, ticker: str, interval: str, fetch_start: date,
+              fetched: dict, start: Optional[date]=None,
+              end: Optional[date]=None) -> dict:
+        merged = self.load(ticker, interval)
+        if fetched:
+            fetch_start_str = fetch_start.strftime(self.date_format)
+            merged = {d: v for d, v in merged.items() if d < fetch_start_str}
+            merged.update(fetched)
+            self.store(ticker, interval, merged)
+        if start is None or end is None:
+            return merged
+        start_str = start.strftime(self.date_format)
+        end_str = end.strftime(self.date_format)
+        return {d: v for d, v in merged.items() if start_str <= d <= end_str}
+
+    def get_age(self, ticker: str, interval: str) -> float:
+        cache_file = self.get_file(ticker, interval)
+        if not cache_file.exists():
+            return float('inf')
+        return time.time() - cache_file.stat().st_mtime
+
+    def invalidate(self, ticker: Optional[str]=None,
+                   interval: Optional[str]=None) -> None:
+        if ticker is None:
+            target = self.cache_dir / interval if interval else self.cache_dir
+            shutil.rmtree(target, ignore_errors=True)
+            return
+        intervals = [interval] if interval else \
+            [d.name for d in self.cache_dir.iterdir() if d.is_dir()] \
+                if self.cache_dir.exists() else []
+        for itr in intervals:
+            self.get_file(ticker, itr).unlink(missing_ok=True)
+
+class TtlCache:
+
+    def __init__(self, cache_file: os.PathLike, ttl: float) -> None:
+        self.cache_file = pathlib.Path(cache_file)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        if self.cache_file.exists():
+            with open(self.cache_file, mode='r') as file:
+                try:
+                    self.entries = json.load(file)
+                except json.JSONDecodeError:
+                    self.entries = {}
+
+    def is_fresh(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and time.time() - entry['time'] <= self.ttl
+
+    def get(self, key: str) -> Any:
+        if not self.is_fresh(key):
+            return None
+        return self.entries[key]['value']
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = {'value': value, 'time': time.time()}
+
+    def invalidate(self, key: Optional[str]=None) -> None:
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def save(self) -> None:
+        with self.lock:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, mode='w') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_file, self.cache_file)
+
+class CheckpointStore:
+
+    def __init__(self, cache_file: os.PathLike) -> None:
+        self.cache_file = pathlib.Path(cache_file)
+
+    def load(self) -> Optional[dict]:
+        if not self.cache_file.exists():
+            return None
+        with open(self.cache_file, mode='r') as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError:
+                return None
+
+    def save(self, state: dict) -> None:
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix('.tmp')
+        with open(tmp_file, mode='w') as file:
+            json.dump(state, file)
+        os.replace(tmp_file, self.cache_file)
+
+    def invalidate(self) -> None:
+        self.cache_file.unlink(missing_ok=True)
+
+class LedgerCache:
+
+    def __init__(self, cache_dir: os.PathLike) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.meta_file = self.cache_dir / 'ledger.json'
+        self.codes_file = self.cache_dir / 'codes.npy'
+        self.numbers_file = self.cache_dir / 'numbers.npy'
+
+    @staticmethod
+    def get_file_digest(source: os.PathLike) -> str:
+        hasher = hashlib.sha256()
+        with open(pathlib.Path(source).expanduser(), mode='rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def get_key(sources: Iterable[os.PathLike], *settings: Any,
+                digests: Optional[dict]=None) -> str:
+        digests = digests if digests else {}
+        hasher = hashlib.sha256(f'{LEDGER_VERSION}'.encode())
+        for source in sources:
+            hasher.update((digests.get(f'{source}') or LedgerCache.get_file_digest(source)).encode())
+            hasher.update(b'\0')
+        hasher.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return hasher.hexdigest()
+
+    def load(self, key: str) -> Optional[Transactions]:
+        if not self.meta_file.exists():
+            return None
+        with open(self.meta_file, mode='r') as file:
+            try:
+                meta = json.load(file)
+            except json.JSONDecodeError:
+                return None
+        if meta.get('key') != key:
+            return None
+        try:
+            codes = np.load(self.codes_file, mmap_mode='r')
+            numbers = np.load(self.numbers_file, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if codes.shape[1] != meta['count'] or numbers.shape[1] != meta['count']:
+            return None
+        transactions_obj = Transactions.from_arrays(codes, numbers, meta['names'])
+        transactions_obj.errors = [CsvRowError(*error) for error in meta['errors']]
+        transactions_obj.build_index()
+        return transactions_obj
+
+    def save(self, key: str, transactions_obj: Transactions) -> None:
+        codes, numbers, names = transactions_obj.to_arrays()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for cache_file, values in ((self.codes_file, codes), (self.numbers_file, numbers)):
+            tmp_file = cache_file.with_suffix('.tmp')
+            with open(tmp_file, mode='wb') as file:
+                np.save(file, values)
+            os.replace(tmp_file, cache_file)
+        tmp_file = self.meta_file.with_suffix('.tmp')
+        with open(tmp_file, mode='w') as file:
+            json.dump({'key': key, 'count': int(codes.shape[1]), 'names': names,
+                       'errors': [[error.line, error.message, error.source]
+                                  for error in transactions_obj.errors]}, file)
+        os.replace(tmp_file, self.meta_file)
+
+    def invalidate(self) -> None:
+        for cache_file in (self.meta_file, self.codes_file, self.numbers_file):
+            cache_file.unlink(missing_ok=True)
@@ -0,0 +1,121 @@
+import numpy as np
+from datetime import date
+from typing import Optional
+from src.transactions import Transaction, TransType
+from src.frame_mngr import PriceFrame
+from src.fx_mngr import FxConverter
+
+class CashLedger:
+
+    def __init__(self) -> None:
+        self.balances = {}
+        self.legs = []
+        self.trade_rates = {}
+
+    def post(self, ordinal: int, wallet: str, currency: str, amount: float) -> None:
+        if not amount:
+            return
+        wallet_balances = self.balances.setdefault(wallet, {})
+        wallet_balances[currency] = wallet_balances.get(currency, 0.0) + amount
+        self.legs.append([ordinal, wallet, currency, amount])
+
+    def apply(self, transaction: Transaction) -> None:
+        ordinal = transaction.date.toordinal()
+        currency = transaction.currency.upper()
+        gross = transaction.price * transaction.quantity
+        if transaction.type in (TransType.BUY, TransType.SELL):
+            self.trade_rates[currency] = transaction.ex_rate
+        if transaction.type == TransType.BUY:
+            self.post(ordinal, transaction.wallet, currency,
+                      -(gross + transaction.fees + transaction.ex_fees))
+        elif transaction.type == TransType.SELL:
+            self.post(ordinal, transaction.wallet, currency,
+                      gross - transaction.fees - transaction.ex_fees)
+        elif transaction.type == TransType.DEPOSIT:
+            self.post(ordinal, transaction.wallet, currency, gross - transaction.fees)
+        elif transaction.type == TransType.WITHDRAW:
+            self.post(ordinal, transaction.wallet, currency, -(gross + transaction.fees))
+        elif transaction.type == TransType.TRANSFER:
+            self.post(ordinal, transaction.wallet, currency, -(gross + transaction.fees))
+            self.post(ordinal, transaction.exchange, currency, gross)
+        elif transaction.type == TransType.CONVERT:
+            self.post(ordinal, transaction.wallet, currency, -(gross + transaction.fees))
+            if transaction.ex_rate > 0:
+                self.post(ordinal, transaction.wallet, transaction.symbol.upper(),
+                          (gross - transaction.ex_fees) / transaction.ex_rate)
+
+    def get_currencies(self) -> list[str]:
+        return list(dict.fromkeys(leg[2] for leg in self.legs))
+
+    def get_balance(self, wallet: Optional[str]=None, currency: Optional[str]=None) -> float:
+        return sum(amount for name, balances in self.balances.items() if wallet is None or name == wallet
+                   for code, amount in balances.items() if currency is None or code == currency)
+
+    def get_balance_rows(self) -> list[dict]:
+        return [{'wallet': wallet, 'currency': currency, 'balance': amount}
+                for wallet, balances in self.balances.items() for currency, amount in balances.items()]
+
+    def to_state(self) -> dict:
+        return {'balances': self.balances, 'legs': self.legs, 'trade_rates': self.trade_rates}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'CashLedger':
+        ledger = cls()
+        ledger.balances = {wallet: dict(balances) for wallet, balances in state['balances'].items()}
+        ledger.legs = [list(leg) for leg in state['legs']]
+        ledger.trade_rates = dict(state['trade_rates'])
+        return ledger
+
+def get_cash_rates(ledger: CashLedger, frame: Optional[PriceFrame], dates: np.ndarray,
+                   currencies: list[str], target: str) -> np.ndarray:
+    rates = np.ones((len(dates), len(currencies)))
+    converter = None
+    rows = np.zeros(len(dates), dtype=np.int64)
+    if frame is not None and len(frame.dates):
+        converter = FxConverter(frame)
+        converter.add_frame_pairs(frame, {})
+        rows = np.maximum(np.searchsorted(frame.dates, dates, side='right') - 1, 0)
+    for idx, currency in enumerate(currencies):
+        if currency == target:
+            continue
+        rate = converter.get_rate(currency, target) if converter else None
+        if rate is not None and not np.isnan(rate[0]).all():
+            rates[:, idx] = rate[0][rows]
+        else:
+            rates[:, idx] = 1.0 / ledger.trade_rates[currency] if currency in ledger.trade_rates else np.nan
+    return rates
+
+class CashSeries:
+
+    def __init__(self, dates: np.ndarray, currencies: list[str], balances: np.ndarray,
+                 rates: np.ndarray) -> None:
+        self.dates = dates
+        self.currencies = currencies
+        self.balances = balances
+        self.rates = rates
+        self.values = np.nan_to_num(balances * rates)
+        self.total = self.values.sum(axis=1)
+        self.unvalued = [currency for currency, is_unvalued
+                         in zip(currencies, (np.isnan(rates) & (balances != 0)).any(axis=0)) if is_unvalued]
+
+    def to_rows(self) -> list[dict]:
+        return [dict({'date': date.fromordinal(int(ordinal)).strftime('%Y-%m-%d')},
+                     **{currency: float(balance) for currency, balance in zip(self.currencies, balances)},
+                     cash=float(total))
+                for ordinal, balances, total in zip(self.dates, self.balances, self.total)]
+
+def build_cash_series(ledger: CashLedger, dates: np.ndarray, frame: Optional[PriceFrame],
+                      target: str) -> CashSeries:
+    currencies = ledger.get_currencies()
+    balances = np.zeros((len(dates), len(currencies)))
+    if ledger.legs and len(dates):
+        codes = {currency: idx for idx, currency in enumerate(currencies)}
+        rows = np.clip(np.fromiter((leg[0] for leg in ledger.legs), dtype=np.int64) - dates[0],
+                       0, len(dates) - 1)
+        columns = np.fromiter((codes[leg[2]] for leg in ledger.legs), dtype=np.int64)
+        amounts = np.fromiter((leg[3] for leg in ledger.legs), dtype=np.float64)
+        balances.ravel()[:] = np.bincount(rows * len(currencies) + columns, weights=amounts,
+                                          minlength=balances.size)
+        np.cumsum(balances, axis=0, out=balances)
+    return CashSeries(dates, currencies, balances,
+                      get_cash_rates(ledger, frame, dates, currencies, target.upper()))
@@ -1,6 +1,13 @@
+import pathlib
 from os import PathLike
 from typing import Optional, Any
 from src.utils import get_yaml_parameter
+from src.lots_mngr import LOT_POLICIES
+from src.returns_mngr import RETURN_WINDOWS
+from src.simulation_mngr import SIMULATION_METHODS
+from src.optimizer_mngr import OPTIMIZATION_TARGETS
+from src.import_mngr import IMPORTERS
+from src.db_mngr import STORAGE_BACKENDS
 
 class ConfigMapUri:
     MARKET_ORIGIN = 'market-origin'
@@ -8,13 +15,43 @@ class ConfigMapUri:
     GENERATION_DIRECTORY = 'gen-dir'
     LOG_DIRECTORY = 'log-dir'
     HISTORY_VARIANT = 'history-var'
+    LOT_POLICY = 'lot-policy'
+    CHECKPOINT = 'checkpoint'
+    LEDGER_CACHE = 'ledger-cache'
+    RETURN_WINDOWS = 'return-windows'
+    BENCHMARK = 'benchmark'
+    RISK_WINDOW = 'risk-window'
+    RISK_FREE_RATE = 'risk-free-rate'
+    WEIGHT_CAP = 'weight-cap'
+    TARGET_ALLOCATION = 'target-allocation'
+    FRONTIER_POINTS = 'frontier-points'
+    SIMULATION_PATHS = 'simulation-paths'
+    SIMULATION_YEARS = 'simulation-years'
+    SIMULATION_METHOD = 'simulation-method'
+    SIMULATION_SEED = 'simulation-seed'
+    SIMULATION_WORKERS = 'simulation-workers'
     TRANSACTIONS_SOURCE = 'trans-src'
     SYMBOLS_STANDARD = 'sym-std'
     TRANSACTIONS_DIRECTORY = 'trans-dir'
     TRANSACTIONS_SHEET = 'trans-sheet'
+    TRANSACTIONS_IMPORTS = 'trans-imports'
     SYMBOLS_MAP_SOURCE = 'sym-map-src'
     SYMBOLS_MAP_DIRECTORY = 'sym-map-dir'
     SYMBOLS_MAP_SHEET = 'sym-map-sheet'
+    MARKET_DIRECTORY = 'market-dir'
+    MARKET_FIXTURE = 'market-fixture'
+    MARKET_RECORD = 'market-record'
+    FETCH_MODE = 'fetch-mode'
+    FETCH_WORKERS = 'fetch-workers'
+    FETCH_RATE_LIMIT = 'fetch-rate-limit'
+    FETCH_RETRIES = 'fetch-retries'
+    FETCH_TIMEOUT = 'fetch-timeout'
+    PRICE_CACHE = 'price-cache'
+    STORAGE_BACKEND = 'storage-backend'
+    STORAGE_DATABASE = 'storage-database'
+    PRICE_CACHE_OVERLAP = 'price-cache-overlap'
+    METADATA_TTL = 'metadata-ttl'
+    QUOTE_TTL = 'quote-ttl'
     LOG_LEVEL = 'log-level'
     QUIET = 'quiet'
 
@@ -72,8 +109,38 @@ def create_cfg(yml_file: PathLike) -> CfgManager:
         CfgParam(name=ConfigMapUri.GENERATION_DIRECTORY, value=yml_dict['directories']['generation-dir']),
         CfgParam(name=ConfigMapUri.LOG_DIRECTORY, value=yml_dict['directories']['log-dir']),
         CfgParam(name=ConfigMapUri.HISTORY_VARIANT, default='lite', value=yml_dict['comp']['history-variant']),
+        CfgParam(name=ConfigMapUri.LOT_POLICY, default='fifo', value=yml_dict['comp'].get('lot-policy')),
+        CfgParam(name=ConfigMapUri.RETURN_WINDOWS, default=['ytd', '1y', 'inception'], value=yml_dict['comp'].get('return-windows')),
+        CfgParam(name=ConfigMapUri.BENCHMARK, value=yml_dict['comp'].get('benchmark')),
+        CfgParam(name=ConfigMapUri.RISK_WINDOW, default=21, value=yml_dict['comp'].get('risk-window')),
+        CfgParam(name=ConfigMapUri.RISK_FREE_RATE, default=0.0, value=yml_dict['comp'].get('risk-free-rate')),
+        CfgParam(name=ConfigMapUri.WEIGHT_CAP, default=1.0, value=yml_dict['comp'].get('weight-cap')),
+        CfgParam(name=ConfigMapUri.TARGET_ALLOCATION, value=yml_dict['comp'].get('target-allocation')),
+        CfgParam(name=ConfigMapUri.FRONTIER_POINTS, default=25, value=yml_dict['comp'].get('frontier-points')),
+        CfgParam(name=ConfigMapUri.SIMULATION_PATHS, default=0, value=yml_dict['comp'].get('simulation-paths')),
+        CfgParam(name=ConfigMapUri.SIMULATION_YEARS, default=10, value=yml_dict['comp'].get('simulation-years')),
+        CfgParam(name=ConfigMapUri.SIMULATION_METHOD, default='bootstrap', value=yml_dict['comp'].get('simulation-method')),
+        CfgParam(name=ConfigMapUri.SIMULATION_SEED, default=0, value=yml_dict['comp'].get('simulation-seed')),
+        CfgParam(name=ConfigMapUri.SIMULATION_WORKERS, default=0, value=yml_dict['comp'].get('simulation-workers')),
+        CfgParam(name=ConfigMapUri.CHECKPOINT, default=False, value=yml_dict['comp'].get('checkpoint', True)),
+        CfgParam(name=ConfigMapUri.LEDGER_CACHE, default=False, value=yml_dict['comp'].get('ledger-cache', True)),
         CfgParam(name=ConfigMapUri.TRANSACTIONS_SOURCE, default='local', value=yml_dict['transactions']['source']),
         CfgParam(name=ConfigMapUri.SYMBOLS_STANDARD, default='yahoo', value=yml_dict['transactions']['symbols-standard']),
+        CfgParam(name=ConfigMapUri.TRANSACTIONS_IMPORTS, default=[], value=yml_dict['transactions'].get('imports')),
+        CfgParam(name=ConfigMapUri.MARKET_DIRECTORY, value=yml_dict.get('market-source', {}).get('directory')),
+        CfgParam(name=ConfigMapUri.MARKET_FIXTURE, value=yml_dict.get('market-source', {}).get('fixture')),
+        CfgParam(name=ConfigMapUri.MARKET_RECORD, value=yml_dict.get('market-source', {}).get('record-fixture')),
+        CfgParam(name=ConfigMapUri.FETCH_MODE, default='batched', value=yml_dict.get('market-fetch', {}).get('mode')),
+        CfgParam(name=ConfigMapUri.FETCH_WORKERS, default=8, value=yml_dict.get('market-fetch', {}).get('workers')),
+        CfgParam(name=ConfigMapUri.FETCH_RATE_LIMIT, default=5.0, value=yml_dict.get('market-fetch', {}).get('rate-limit')),
+        CfgParam(name=ConfigMapUri.FETCH_RETRIES, default=3, value=yml_dict.get('market-fetch', {}).get('retries')),
+        CfgParam(name=ConfigMapUri.FETCH_TIMEOUT, default=30.0, value=yml_dict.get('market-fetch', {}).get('timeout')),
+        CfgParam(name=ConfigMapUri.PRICE_CACHE, default=False, value=yml_dict.get('market-cache', {}).get('enabled', True)),
+        CfgParam(name=ConfigMapUri.PRICE_CACHE_OVERLAP, default=5, value=yml_dict.get('market-cache', {}).get('overlap-days')),
+        CfgParam(name=ConfigMapUri.METADATA_TTL, default=604800, value=yml_dict.get('market-cache', {}).get('metadata-ttl')),
+        CfgParam(name=ConfigMapUri.QUOTE_TTL, default=300, value=yml_dict.get('market-cache', {}).get('quote-ttl')),
+        CfgParam(name=ConfigMapUri.STORAGE_BACKEND, default='files', value=yml_dict.get('storage', {}).get('backend')),
+        CfgParam(name=ConfigMapUri.STORAGE_DATABASE, value=yml_dict.get('storage', {}).get('database')),
         CfgParam(name=ConfigMapUri.LOG_LEVEL, default='NOTSET', value=yml_dict['cli-exec']['log-level'].upper()),
         CfgParam(name=ConfigMapUri.QUIET, default=False, value=yml_dict['cli-exec']['quiet'])
     ]
@@ -105,8 +172,33 @@ def create_cfg(yml_file: PathLike) -> CfgManager:
         ]
     params_obj.add(conf)
     conf.clear()
+    validate_cfg(params_obj)
     return CfgManager(params_obj)
 
+def validate_cfg(params_obj: CfgParams) -> None:
+    imports = params_obj.get(ConfigMapUri.TRANSACTIONS_IMPORTS)
+    if not isinstance(imports, list) or any(not isinstance(entry, dict) or not entry.get('path')
+                                            or f'{entry.get("format")}'.lower() not in IMPORTERS
+                                            or not pathlib.Path(f'{entry["path"]}').expanduser().is_file()
+                                            for entry in imports):
+        raise Exception("417")
+    if params_obj.get(ConfigMapUri.LOT_POLICY) not in LOT_POLICIES:
+        raise Exception("417")
+    windows = params_obj.get(ConfigMapUri.RETURN_WINDOWS)
+    if not isinstance(windows, list) or any(window not in RETURN_WINDOWS for window in windows):
+        raise Exception("417")
+    if params_obj.get(ConfigMapUri.SIMULATION_METHOD) not in SIMULATION_METHODS:
+        raise Exception("417")
+    target = params_obj.get(ConfigMapUri.TARGET_ALLOCATION)
+    if isinstance(target, dict):
+        if not all(isinstance(weight, (int, float)) and weight >= 0 for weight in target.values()) \
+                or sum(target.values()) <= 0:
+            raise Exception("417")
+    elif target is not None and target not in OPTIMIZATION_TARGETS:
+        raise Exception("417")
+    if params_obj.get(ConfigMapUri.STORAGE_BACKEND) not in STORAGE_BACKENDS:
+        raise Exception("417")
+
 class Directories:
 
     def __init__(self, base_dir: str, log_dir: Optional[str],
@@ -121,12 +213,34 @@ class Directories:
         self.history_dir = self.market_data_dir + 'history/'
         self.history_lite_dir = self.history_dir + 'lite/'
         self.history_full_dir = self.history_dir + 'full/'
+        self.cache_dir = self.base_dir + 'cache/'
+        self.price_cache_dir = self.cache_dir + 'prices/'
+        self.metadata_cache_file = self.cache_dir + 'metadata.json'
+        self.quote_cache_file = self.cache_dir + 'quotes.json'
+        self.checkpoint_file = self.cache_dir + 'portfolio.json'
+        self.ledger_cache_dir = self.cache_dir + 'ledger/'
+        self.database_file = self.cache_dir + 'portfolio.db'
         self.generated_dir = self.base_dir + 'generated/'
         self.gen_portfolio_file = self.generated_dir + 'portfolio.csv'
         self.gen_entries_file = self.generated_dir + 'entries.md'
         self.gen_total_file = self.generated_dir + 'total.md'
+        self.gen_realized_file = self.generated_dir + 'realized.csv'
+        self.gen_lots_file = self.generated_dir + 'lots.csv'
+        self.gen_nav_file = self.generated_dir + 'nav.csv'
+        self.gen_returns_file = self.generated_dir + 'returns.csv'
+        self.gen_cash_file = self.generated_dir + 'cash.csv'
+        self.gen_rollups_file = self.generated_dir + 'rollups.csv'
+        self.gen_cash_balances_file = self.generated_dir + 'cash_balances.csv'
+        self.gen_risk_file = self.generated_dir + 'risk.csv'
+        self.gen_correlation_file = self.generated_dir + 'correlation.csv'
+        self.gen_volatility_file = self.generated_dir + 'rolling_volatility.csv'
+        self.gen_projection_file = self.generated_dir + 'projection.csv'
+        self.gen_frontier_file = self.generated_dir + 'frontier.csv'
+        self.gen_allocation_file = self.generated_dir + 'allocation.csv'
+        self.gen_rebalance_file = self.generated_dir + 'rebalance.csv'
         self.gen_sheets_urls_file = self.generated_dir + 'sheets_urls.md'
         self.plots_dir = self.generated_dir + 'plots/'
         self.plots_stocks_dir = self.plots_dir + 'stocks/'
         self.gen_plots_history = self.plots_stocks_dir + 'history.png'
         self.gen_plots_stats = self.plots_dir + 'gen_stats.png'
+        self.gen_plots_projection = self.plots_dir + 'projection.png'
@@ -1,20 +1,87 @@
 import csv
 import pathlib
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+class CsvRowError:
+    __slots__ = ('line', 'message', 'source')
+
+    def __init__(self, line: int, message: str, source: Optional[str]=None) -> None:
+        self.line = line
+        self.message = message
+        self.source = source
+
+    def __str__(self) -> str:
+        if self.source:
+            return f'{self.source} line {self.line}: {self.message}'
+        return f'line {self.line}: {self.message}'
 
 class CsvMngr:
     def __init__(self, file_path: pathlib.Path,
-                 headers: list[str]) -> None:
+                 headers: list[str],
+                 converters: Optional[dict[str, Callable[[str], Any]]]=None,
+                 defaults: Optional[dict[str, str]]=None,
+                 aliases: Optional[dict[str, Tuple[str, ...]]]=None) -> None:
         self.file_path = file_path
         self.headers = headers
+        self.converters = converters if converters else {}
+        self.defaults = defaults if defaults else {}
+        self.aliases = aliases if aliases else {}
+        self.errors = []
 
-    def read(self) -> list:
-        with open(self.file_path, 'r') as file:
+    def get_indexes(self, header_row: list[str]) -> list[int]:
+        names = [name.strip().lower() for name in header_row]
+        indexes = []
+        missing = []
+        for header in self.headers:
+            candidates = (header,) + self.aliases.get(header, ())
+            index = next((names.index(name) for name in candidates if name in names), None)
+            if index is None:
+                missing.append(header)
+            indexes.append(index)
+        if missing:
+            raise ValueError(f'Missing columns in {self.file_path}: {", ".join(missing)}')
+        return indexes
+
+    def iter_rows(self) -> Iterator[Tuple[int, list[str]]]:
+        with open(self.file_path, 'r', newline='') as file:
             reader = csv.reader(file)
-            rows = list(reader)
-            ret = [dict(zip(self.headers, row)) for row in rows]
-            ret.pop(0)
-            return ret
+            header_row = next(reader, None)
+            if header_row is None:
+                return
+            indexes = self.get_indexes(header_row)
+            width = max(indexes) + 1
+            for row in reader:
+                if not row or not any(value.strip() for value in row):
+                    continue
+                if len(row) < width:
+                    self.errors.append(CsvRowError(reader.line_num,
+                                                   f'expected {width} columns, got {len(row)}'))
+                    continue
+                yield reader.line_num, [row[index] for index in indexes]
+
+    def iter_records(self) -> Iterator[dict]:
+        self.errors = []
+        fields = [(self.converters.get(header, str), self.defaults.get(header, ''))
+                  for header in self.headers]
+        for line, values in self.iter_rows():
+            try:
+                converted = [converter(value.strip() or default)
+                             for (converter, default), value in zip(fields, values)]
+            except (ValueError, TypeError):
+                self.errors.append(CsvRowError(line, self.get_error(fields, values)))
+                continue
+            yield dict(zip(self.headers, converted))
+
+    def get_error(self, fields: list[tuple], values: list[str]) -> str:
+        for header, (converter, default), value in zip(self.headers, fields, values):
+            try:
+                converter(value.strip() or default)
+            except (ValueError, TypeError) as error:
+                return f'{header}: {error}'
+        return 'invalid row'
+
+    def read(self) -> list:
+        return list(self.iter_records())
 
     def write(self, data: Iterable[Iterable[Any]]):
         with open(self.file_path, 'w', newline='') as file:
@@ -58,3 +125,9 @@ def write_csv_lazy(path: pathlib.Path, data_dict: dict, key: str) -> None:
         for symbol, data in data_dict.items():
             row = [symbol] + list(data.values())
             writer.writerow(row)
+
+def write_csv_records(path: pathlib.Path, headers: list[str],
+                      records: Iterable[dict]) -> None:
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    CsvMngr(pathlib.Path(path), headers).write([record[header] for header in headers]
+                                              for record in records)
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import sqlite3
+import pathlib
+import threading
+from typing import Any, Iterable, Optional
+from datetime import date, datetime, timedelta
+from src.csv_mngr import CsvRowError
+from src.fx_mngr import parse_fx_ticker
+from src.transactions import Transaction, Transactions, TransType
+
+TRANSACTION_COLUMNS = ('type', 'date', 'quantity', 'fees', 'price', 'currency', 'symbol', 'exchange',
+                       'wallet', 'ex_rate', 'ex_fees')
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS transactions (
+           id INTEGER PRIMARY KEY, type TEXT NOT NULL, date TEXT NOT NULL, quantity REAL NOT NULL,
+           fees REAL NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL, symbol TEXT NOT NULL,
+           exchange TEXT NOT NULL, wallet TEXT NOT NULL, ex_rate REAL NOT NULL, ex_fees REAL NOT NULL)''',
+    'CREATE INDEX IF NOT EXISTS transactions_symbol_date ON transactions (symbol, date)',
+    'CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date)',
+    '''CREATE TABLE IF NOT EXISTS prices (
+           ticker TEXT NOT NULL, interval TEXT NOT NULL, date TEXT NOT NULL, close REAL NOT NULL,
+           PRIMARY KEY (ticker, interval, date)) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS fx_rates (
+           ticker TEXT NOT NULL, base TEXT NOT NULL, quote TEXT NOT NULL, interval TEXT NOT NULL,
+           date TEXT NOT NULL, rate REAL NOT NULL, PRIMARY KEY (ticker, interval, date)) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS fx_rates_pair_date ON fx_rates (base, quote, interval, date)',
+    '''CREATE TABLE IF NOT EXISTS series (
+           ticker TEXT NOT NULL, interval TEXT NOT NULL, updated REAL NOT NULL,
+           PRIMARY KEY (ticker, interval)) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS entries (
+           scope TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL,
+           PRIMARY KEY (scope, key)) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS snapshots (
+           name TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)''',
+)
+
+class StorageBackend:
+    FILES = 'files'
+    SQLITE = 'sqlite'
+
+STORAGE_BACKENDS = (StorageBackend.FILES, StorageBackend.SQLITE)
+
+def get_price_table(ticker: str) -> tuple[str, str]:
+    return ('fx_rates', 'rate') if parse_fx_ticker(ticker) else ('prices', 'close')
+
+class PortfolioDb:
+
+    def __init__(self, db_file: os.PathLike, timeout: float=30.0) -> None:
+        self.db_file = pathlib.Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.connection = sqlite3.connect(self.db_file, timeout=timeout, check_same_thread=False,
+                                          isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(f'PRAGMA busy_timeout={int(timeout * 1000)}')
+        with self.transaction():
+            self.drop_legacy_fx_rates()
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def drop_legacy_fx_rates(self) -> None:
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(fx_rates)').fetchall()]
+        if not columns or 'ticker' in columns:
+            return
+        self.connection.execute('DROP TABLE fx_rates')
+        self.connection.executemany('DELETE FROM series WHERE ticker = ?',
+                                    [row for row in self.connection.execute('SELECT DISTINCT ticker FROM series')
+                                     .fetchall() if parse_fx_ticker(row[0])])
+
+    def transaction(self, immediate: bool=True) -> 'DbTransaction':
+        return DbTransaction(self, immediate)
+
+    def execute(self, statement: str, parameters: Iterable=()) -> list[tuple]:
+        with self.lock:
+            return self.connection.execute(statement, tuple(parameters)).fetchall()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def get_prices(self, ticker: str, start: date, end: date, interval: str='1d') -> dict:
+        table, column = get_price_table(ticker)
+        return dict(self.execute(f'SELECT date, {column} FROM {table} WHERE ticker = ? AND interval = ? '
+                                 'AND date >= ? AND date <= ? ORDER BY date',
+                                 (ticker, interval, f'{start}', f'{end}')))
+
+    def get_fx_rates(self, base: str, quote: str, start: date, end: date, interval: str='1d') -> dict:
+        return dict(self.execute('SELECT date, rate FROM fx_rates WHERE base = ? AND quote = ? AND interval = ? '
+                                 'AND date >= ? AND date <= ? ORDER BY date',
+                                 (base.upper(), quote.upper(), interval, f'{start}', f'{end}')))
+
+    def store_transactions(self, transactions: Iterable[Transaction]) -> None:
+        with self.transaction():
+            self.connection.execute('DELETE FROM transactions')
+            self.connection.executemany(
+                f'INSERT INTO transactions ({", ".join(TRANSACTION_COLUMNS)}) VALUES '
+                f'({", ".join("?" * len(TRANSACTION_COLUMNS))})',
+                ((str(transaction.type), f'{transaction.date}', transaction.quantity, transaction.fees,
+                  transaction.price, transaction.currency, transaction.symbol, transaction.exchange,
+                  transaction.wallet, transaction.ex_rate, transaction.ex_fees)
+                 for transaction in transactions))
+
+    def get_snapshot(self, name: str) -> Optional[Any]:
+        rows = self.execute('SELECT state FROM snapshots WHERE name = ?', (name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_snapshot(self, name: str, state: Any) -> None:
+        self.execute('INSERT OR REPLACE INTO snapshots (name, state, updated) VALUES (?, ?, ?)',
+                     (name, json.dumps(state), time.time()))
+
+    def remove_snapshot(self, name: str) -> None:
+        self.execute('DELETE FROM snapshots WHERE name = ?', (name,))
+
+class DbTransaction:
+
+    def __init__(self, db: PortfolioDb, immediate: bool=True) -> None:
+        self.db = db
+        self.immediate = immediate
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.lock.acquire()
+        if not self.db.depth:
+            try:
+                self.db.connection.execute('BEGIN IMMEDIATE' if self.immediate else 'BEGIN')
+            except sqlite3.Error:
+                self.db.lock.release()
+                raise
+        self.db.depth += 1
+        return self.db.connection
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.db.depth -= 1
+        try:
+            if not self.db.depth:
+                self.db.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+        finally:
+            self.db.lock.release()
+
+def row_to_transaction(row: tuple) -> Transaction:
+    return Transaction.from_record({'type': TransType.from_str(row[0]), 'date': date.fromisoformat(row[1]),
+                                    'quantity': row[2], 'fees': row[3], 'price': row[4], 'currency': row[5],
+                                    'symbol': row[6], 'exchange': row[7], 'wallet': row[8],
+                                    'ex_rate': row[9], 'ex_fees': row[10]})
+
+class DbPriceCache:
+
+    def __init__(self, db: PortfolioDb, overlap_days: int=5, date_format: str='%Y-%m-%d') -> None:
+        self.db = db
+        self.overlap_days = overlap_days
+        self.date_format = date_format
+
+    def load(self, ticker: str, interval: str) -> dict:
+        table, column = get_price_table(ticker)
+        return dict(self.db.execute(f'SELECT date, {column} FROM {table} WHERE ticker = ? AND interval = ? '
+                                    'ORDER BY date', (ticker, interval)))
+
+    def store(self, ticker: str, interval: str, series: dict, start: Optional[str]=None) -> None:
+        table, column = get_price_table(ticker)
+        pair = parse_fx_ticker(ticker)
+        names, keys = ('ticker, base, quote', (ticker,) + pair) if pair else ('ticker', (ticker,))
+        with self.db.transaction() as connection:
+            if start is None:
+                connection.execute(f'DELETE FROM {table} WHERE ticker = ? AND interval = ?', (ticker, interval))
+            else:
+                connection.execute(f'DELETE FROM {table} WHERE ticker = ? AND interval = ? AND date >= ?',
+                                   (ticker, interval, start))
+            connection.executemany(f'INSERT OR REPLACE INTO {table} ({names}, interval, date, {column}) '
+                                   f'VALUES ({", ".join("?" * (len(keys) + 3))})',
+                                   (keys + (interval, day, float(value)) for day, value in series.items()))
+            connection.execute('INSERT OR REPLACE INTO series (ticker, interval, updated) VALUES (?, ?, ?)',
+                               (ticker, interval, time.time()))
+
+    def get_fetch_start(self, ticker: str, interval: str, start_date: date) -> date:
+        table, _ = get_price_table(ticker)
+        first, last = self.db.execute(f'SELECT MIN(date), MAX(date) FROM {table} WHERE ticker = ? '
+                                      'AND interval = ?', (ticker, interval))[0]
+        if first is None:
+            return start_date
+        if datetime.strptime(first, self.date_format).date() > start_date + timedelta(days=self.overlap_days):
+            return start_date
+        last_date = datetime.strptime(last, self.date_format).date()
+        return max(start_date, last_date - timedelta(days=self.overlap_days))
+
+    def merge(self, ticker: str, interval: str, fetch_start: date, fetched: dict,
+              start: Optional[date]=None, end: Optional[date]=None) -> dict:
+        if fetched:
+            self.store(ticker, interval, fetched, fetch_start.strftime(self.date_format))
+        if start is None or end is None:
+            return self.load(ticker, interval)
+        return self.db.get_prices(ticker, start, end, interval)
+
+    def get_age(self, ticker: str, interval: str) -> float:
+        rows = self.db.execute('SELECT updated FROM series WHERE ticker = ? AND interval = ?', (ticker, interval))
+        return time.time() - rows[0][0] if rows else float('inf')
+
+    def invalidate(self, ticker: Optional[str]=None, interval: Optional[str]=None) -> None:
+        with self.db.transaction() as connection:
+            if ticker is None:
+                for table in ('prices', 'fx_rates', 'series'):
+                    if interval:
+                        connection.execute(f'DELETE FROM {table} WHERE interval = ?', (interval,))
+                    else:
+                        connection.execute(f'DELETE FROM {table}')
+                return
+            table, _ = get_price_table(ticker)
+            interval_condition = ' AND interval = ?' if interval else ''
+            interval_keys = (interval,) if interval else ()
+            connection.execute(f'DELETE FROM {table} WHERE ticker = ?{interval_condition}', (ticker,) + interval_keys)
+            connection.execute(f'DELETE FROM series WHERE ticker = ?{interval_condition}', (ticker,) + interval_keys)
+
+class DbTtlCache:
+
+    def __init__(self, db: PortfolioDb, scope: str, ttl: float) -> None:
+        self.db = db
+        self.scope = scope
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+        rows = self.db.execute('SELECT value, updated FROM entries WHERE scope = ? AND key = ?', (self.scope, key))
+        return rows[0] if rows else None
+
+    def is_fresh(self, key: str) -> bool:
+        entry = self.get_entry(key)
+        return entry is not None and time.time() - entry[1] <= self.ttl
+
+    def get(self, key: str) -> Any:
+        entry = self.get_entry(key)
+        if entry is None or time.time() - entry[1] > self.ttl:
+            return None
+        return json.loads(entry[0])
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.pending[key] = (json.dumps(value), time.time())
+
+    def invalidate(self, key: Optional[str]=None) -> None:
+        with self.lock:
+            if key is None:
+                self.pending.clear()
+            else:
+                self.pending.pop(key, None)
+        if key is None:
+            self.db.execute('DELETE FROM entries WHERE scope = ?', (self.scope,))
+        else:
+            self.db.execute('DELETE FROM entries WHERE scope = ? AND key = ?', (self.scope, key))
+
+    def save(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if pending:
+            with self.db.transaction() as connection:
+                connection.executemany('INSERT OR REPLACE INTO entries (scope, key, value, updated) '
+                                       'VALUES (?, ?, ?, ?)',
+                                       ((self.scope, key, value, updated)
+                                        for key, (value, updated) in pending.items()))
+
+class DbCheckpointStore:
+
+    def __init__(self, db: PortfolioDb, name: str='portfolio') -> None:
+        self.db = db
+        self.name = name
+
+    def load(self) -> Optional[dict]:
+        return self.db.get_snapshot(self.name)
+
+    def save(self, state: dict) -> None:
+        self.db.set_snapshot(self.name, state)
+
+    def invalidate(self) -> None:
+        self.db.remove_snapshot(self.name)
+
+class DbLedgerCache:
+
+    def __init__(self, db: PortfolioDb, name: str='ledger') -> None:
+        self.db = db
+        self.name = name
+
+    def load(self, key: str) -> Optional[Transactions]:
+        with self.db.transaction(immediate=False):
+            meta = self.db.get_snapshot(self.name)
+            if not meta or meta.get('key') != key:
+                return None
+            rows = self.db.execute(f'SELECT {", ".join(TRANSACTION_COLUMNS)} FROM transactions ORDER BY id')
+        if len(rows) != meta['count']:
+            return None
+        transactions_obj = Transactions()
+        transactions_obj.transactions = [row_to_transaction(row) for row in rows]
+        transactions_obj.errors = [CsvRowError(*error) for error in meta['errors']]
+        transactions_obj.build_index()
+        return transactions_obj
+
+    def save(self, key: str, transactions_obj: Transactions) -> None:
+        with self.db.transaction():
+            self.db.store_transactions(transactions_obj.get())
+            self.db.set_snapshot(self.name, {'key': key, 'count': len(transactions_obj.get()),
+                                             'errors': [[error.line, error.message, error.source]
+                                                        for error in transactions_obj.errors]})
+
+def open_database(backend: str, db_file: os.PathLike) -> Optional[PortfolioDb]:
+    if backend == StorageBackend.FILES:
+        return None
+    if backend == StorageBackend.SQLITE:
+        return PortfolioDb(db_file)
+    raise ValueError(f'Unsupported storage backend: {backend}')
@@ -0,0 +1,105 @@
+import time
+import random
+import threading
+from typing import Any, Callable, Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: Optional[float]=None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class FetchError:
+
+    def __init__(self, key: str, error: str, attempts: int) -> None:
+        self.key = key
+        self.error = error
+        self.attempts = attempts
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.error} (after {self.attempts} attempts)'
+
+    def __dict__(self) -> dict:
+        return {'key': self.key, 'error': self.error, 'attempts': self.attempts}
+
+class FetchFailed(Exception):
+
+    def __init__(self, cause: Exception, attempts: int) -> None:
+        super().__init__(str(cause))
+        self.cause = cause
+        self.attempts = attempts
+
+class FetchEngine:
+
+    def __init__(self, workers: int=8, rate_limit: float=5.0,
+                 retries: int=3, backoff: float=0.5, max_backoff: float=8.0,
+                 timeout: float=30.0) -> None:
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+    def get_backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call_with_retries(self, func: Callable[[str], Any], key: str) -> Tuple[Any, int]:
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                return func(key), attempt + 1
+            except Exception as exc:
+                if attempt >= self.retries:
+                    raise FetchFailed(exc, attempt + 1)
+                time.sleep(self.get_backoff(attempt))
+                attempt += 1
+
+    def run(self, func: Callable[[str], Any], keys: Iterable[str],
+            workers: Optional[int]=None) -> Tuple[dict, list[FetchError]]:
+        results = {}
+        errors = []
+        started = {}
+        budget = self.timeout * (self.retries + 1) + self.max_backoff * self.retries
+
+        def job(key: str) -> Tuple[Any, int]:
+            started[key] = time.monotonic()
+            return self.call_with_retries(func, key)
+
+        executor = ThreadPoolExecutor(max_workers=workers if workers else self.workers)
+        pending = {key: executor.submit(job, key) for key in dict.fromkeys(keys)}
+        while pending:
+            wait(pending.values(), timeout=0.1, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for key, future in list(pending.items()):
+                if future.done():
+                    try:
+                        results[key], _ = future.result()
+                    except FetchFailed as exc:
+                        errors.append(FetchError(key, f'{type(exc.cause).__name__}: {exc.cause}', exc.attempts))
+                    del pending[key]
+                elif key in started and now - started[key] > budget:
+                    errors.append(FetchError(key, 'timed out', self.retries + 1))
+                    del pending[key]
+        executor.shutdown(wait=False, cancel_futures=True)
+        return results, errors
@@ -0,0 +1,157 @@
+import numpy as np
+from typing import Callable, Optional
+from datetime import date, datetime
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class Period:
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    QUARTER = 'quarter'
+    YEAR = 'year'
+
+class Aggregation:
+    LAST = 'last'
+    FIRST = 'first'
+    MEAN = 'mean'
+    HIGH = 'high'
+    LOW = 'low'
+
+def ordinals_to_datetime64(ordinals: np.ndarray) -> np.ndarray:
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+
+def datetime64_to_ordinals(dates: np.ndarray) -> np.ndarray:
+    return dates.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+
+def month_start_ordinals(ordinals: np.ndarray) -> np.ndarray:
+    return datetime64_to_ordinals(ordinals_to_datetime64(ordinals).astype('datetime64[M]'))
+
+def period_start_ordinals(ordinals: np.ndarray, period: str) -> np.ndarray:
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if period == Period.DAY:
+        return ordinals
+    if period == Period.WEEK:
+        return ordinals - (ordinals - 1) % 7
+    months = ordinals_to_datetime64(ordinals).astype('datetime64[M]')
+    if period == Period.QUARTER:
+        months = months - months.astype(np.int64) % 3
+    elif period == Period.YEAR:
+        months = months.astype('datetime64[Y]')
+    return datetime64_to_ordinals(months)
+
+class PriceFrame:
+
+    def __init__(self, dates: np.ndarray, symbols: list[str],
+                 values: np.ndarray, period: str=Period.DAY) -> None:
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.symbols = list(symbols)
+        self.symbol_index = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.dates), len(self.symbols))
+        self.period = period
+        self.views = {}
+
+    @classmethod
+    def from_series(cls, series: dict, date_format: str='%Y-%m-%d',
+                    period: str=Period.DAY) -> 'PriceFrame':
+        symbols = list(series.keys())
+        date_strs = sorted({d for prices in series.values() for d in prices})
+        dates = np.array([datetime.strptime(d, date_format).toordinal() for d in date_strs],
+                         dtype=np.int64)
+        row_index = {d: idx for idx, d in enumerate(date_strs)}
+        values = np.full((len(dates), len(symbols)), np.nan)
+        for col, symbol in enumerate(symbols):
+            if series[symbol]:
+                rows = np.fromiter((row_index[d] for d in series[symbol]), dtype=np.int64,
+                                   count=len(series[symbol]))
+                values[rows, col] = np.fromiter(series[symbol].values(), dtype=np.float64,
+                                                count=len(series[symbol]))
+        return cls(dates, symbols, values, period)
+
+    def has_symbol(self, symbol: str) -> bool:
+        return symbol in self.symbol_index
+
+    def column(self, symbol: str) -> np.ndarray:
+        return self.values[:, self.symbol_index[symbol]]
+
+    def get_row(self, ordinal: int) -> int:
+        row = int(np.searchsorted(self.dates, ordinal))
+        if row < len(self.dates) and self.dates[row] == ordinal:
+            return row
+        return -1
+
+    def get_price(self, symbol: str, ordinal: int) -> float:
+        row = self.get_row(ordinal)
+        if row < 0 or symbol not in self.symbol_index:
+            return np.nan
+        return float(self.values[row, self.symbol_index[symbol]])
+
+    def get_last_price(self, symbol: str) -> float:
+        prices = self.column(symbol)
+        valid = np.flatnonzero(~np.isnan(prices))
+        return float(prices[valid[-1]]) if len(valid) else np.nan
+
+    def get_valid(self, symbol: str) -> tuple[np.ndarray, np.ndarray]:
+        prices = self.column(symbol)
+        mask = ~np.isnan(prices)
+        return self.dates[mask], prices[mask]
+
+    def get_labels(self, formatter: Optional[Callable[[date], str]]=None,
+                   dates: Optional[np.ndarray]=None) -> list[str]:
+        dates = self.dates if dates is None else dates
+        if formatter is None:
+            formatter = get_period_formatter(self.period)
+        return [formatter(date.fromordinal(int(d))) for d in dates]
+
+    def resample(self, period: str, how: str=Aggregation.LAST) -> 'PriceFrame':
+        if period == self.period and how == Aggregation.LAST:
+            return self
+        if (period, how) not in self.views:
+            self.views[(period, how)] = self.aggregate(period, how)
+        return self.views[(period, how)]
+
+    def aggregate(self, period: str, how: str) -> 'PriceFrame':
+        if not len(self.dates):
+            return PriceFrame(self.dates, self.symbols, self.values, period)
+        periods = period_start_ordinals(self.dates, period)
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        valid = ~np.isnan(self.values)
+        if how in (Aggregation.LAST, Aggregation.FIRST):
+            row_numbers = np.arange(len(self.dates))[:, None]
+            if how == Aggregation.LAST:
+                rows = np.maximum.reduceat(np.where(valid, row_numbers, -1), starts, axis=0)
+            else:
+                rows = np.minimum.reduceat(np.where(valid, row_numbers, len(self.dates)), starts, axis=0)
+                rows[rows == len(self.dates)] = -1
+            values = np.where(rows >= 0,
+                              np.take_along_axis(self.values, np.maximum(rows, 0), axis=0),
+                              np.nan)
+        elif how == Aggregation.MEAN:
+            counts = np.add.reduceat(valid, starts, axis=0)
+            sums = np.add.reduceat(np.where(valid, self.values, 0.0), starts, axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = np.where(counts > 0, sums / counts, np.nan)
+        elif how == Aggregation.HIGH:
+            values = np.fmax.reduceat(self.values, starts, axis=0)
+        elif how == Aggregation.LOW:
+            values = np.fmin.reduceat(self.values, starts, axis=0)
+        else:
+            raise ValueError(f'Unsupported aggregation: {how}')
+        return PriceFrame(periods[starts], self.symbols, values, period)
+
+    def clear_views(self) -> None:
+        self.views.clear()
+
+def get_month_label(work_date: date) -> str:
+    months = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+              'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+    return months[work_date.month - 1] + str(work_date.year)[2:]
+
+def get_period_formatter(period: str) -> Callable[[date], str]:
+    if period == Period.MONTH:
+        return get_month_label
+    if period == Period.QUARTER:
+        return lambda d: f'q{(d.month - 1) // 3 + 1}-{str(d.year)[2:]}'
+    if period == Period.YEAR:
+        return lambda d: str(d.year)
+    return lambda d: d.strftime('%Y-%m-%d')
@@ -0,0 +1,104 @@
+import re
+import numpy as np
+from typing import Iterable, Optional, Tuple
+from src.frame_mngr import PriceFrame
+
+FX_TICKER_PATTERN = re.compile(r'^([A-Z]{3})?([A-Z]{3})=X$')
+
+def parse_fx_ticker(ticker: str) -> Optional[Tuple[str, str]]:
+    match = FX_TICKER_PATTERN.match(ticker.upper())
+    if not match:
+        return None
+    base, quote = match.groups()
+    return (base if base else 'USD'), quote
+
+def get_fx_ticker(base: str, quote: str) -> str:
+    return f'{base.upper()}{quote.upper()}=X'
+
+def is_pair_resolvable(pairs: set[Tuple[str, str]], source: str,
+                       target: str) -> bool:
+    def linked(first: str, second: str) -> bool:
+        return first == second or (first, second) in pairs or (second, first) in pairs
+    if linked(source, target):
+        return True
+    currencies = {currency for pair in pairs for currency in pair}
+    return any(linked(source, pivot) and linked(pivot, target) for pivot in currencies)
+
+def fill_asof(values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return values.copy()
+    rows = np.where(valid, np.arange(len(values)), -1)
+    np.maximum.accumulate(rows, out=rows)
+    return np.where(rows < 0, np.nan, values[np.maximum(rows, 0)])
+
+class FxConverter:
+
+    def __init__(self, frame: PriceFrame) -> None:
+        self.length = len(frame.dates)
+        self.rates = {}
+        self.spots = {}
+
+    def add_pair(self, base: str, quote: str, series: np.ndarray,
+                 spot: float) -> None:
+        if base == quote:
+            return
+        self.rates[(base, quote)] = fill_asof(series)
+        self.spots[(base, quote)] = spot
+
+    def add_frame_pairs(self, frame: PriceFrame, current_prices: dict,
+                        failed_tickers: Iterable[str]=()) -> None:
+        failed_tickers = set(failed_tickers)
+        for ticker in frame.symbols:
+            pair = parse_fx_ticker(ticker)
+            if not pair or ticker in failed_tickers:
+                continue
+            series = frame.column(ticker)
+            if np.isnan(series).all():
+                continue
+            self.add_pair(pair[0], pair[1], series, current_prices.get(ticker, np.nan))
+
+    def get_currencies(self) -> set[str]:
+        return {currency for pair in self.rates for currency in pair}
+
+    def get_direct_rate(self, source: str,
+                        target: str) -> Optional[Tuple[np.ndarray, float]]:
+        if source == target:
+            return np.ones(self.length), 1.0
+        if (source, target) in self.rates:
+            return self.rates[(source, target)], self.spots[(source, target)]
+        if (target, source) in self.rates:
+            return 1.0 / self.rates[(target, source)], 1.0 / self.spots[(target, source)]
+        return None
+
+    def get_rate(self, source: str,
+                 target: str) -> Optional[Tuple[np.ndarray, float]]:
+        rate = self.get_direct_rate(source, target)
+        if rate is not None:
+            return rate
+        for pivot in self.get_currencies():
+            first = self.get_direct_rate(source, pivot)
+            second = self.get_direct_rate(pivot, target)
+            if first is not None and second is not None:
+                return first[0] * second[0], first[1] * second[1]
+        return None
+
+    def convert_frame(self, frame: PriceFrame, currencies: dict,
+                      current_prices: dict, target: str) -> list[str]:
+        groups = {}
+        for ticker, currency in currencies.items():
+            if currency != target and not parse_fx_ticker(ticker) and frame.has_symbol(ticker):
+                groups.setdefault(currency, []).append(ticker)
+        unresolved = []
+        frame.clear_views()
+        for currency, tickers in groups.items():
+            rate = self.get_rate(currency, target)
+            if rate is None:
+                unresolved += tickers
+                continue
+            columns = [frame.symbol_index[ticker] for ticker in tickers]
+            frame.values[:, columns] *= rate[0][:, None]
+            for ticker in tickers:
+                current_prices[ticker] *= rate[1]
+                currencies[ticker] = target
+        return unresolved
@@ -0,0 +1,250 @@
+import csv
+import os
+import pathlib
+import numpy as np
+from operator import itemgetter
+from typing import Callable, Optional
+from src.csv_mngr import CsvRowError
+from src.transactions import TransType
+
+CURRENCY_SYMBOLS = ('$', '€', '£', '¥', ',', ' ')
+
+class ImportFormat:
+    IBKR = 'ibkr'
+    DEGIRO = 'degiro'
+    COINBASE = 'coinbase'
+
+class ImportResult:
+
+    def __init__(self, source: pathlib.Path, importer: str) -> None:
+        self.source = source
+        self.importer = importer
+        self.records = []
+        self.skipped = []
+
+    def skip(self, lines: np.ndarray, message: str) -> None:
+        self.skipped += [CsvRowError(int(line), message, f'{self.source}') for line in lines]
+
+class RawTable:
+
+    def __init__(self, path: pathlib.Path, is_header: Callable[[list[str]], bool]) -> None:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+            rows = list(csv.reader(file))
+        start = next((idx for idx, row in enumerate(rows) if is_header(row)), None)
+        if start is None:
+            raise ValueError(f'Unrecognized export format: {path}')
+        header = rows[start]
+        self.header = [name.strip() for name in header]
+        self.names = {}
+        for idx, name in enumerate(self.header):
+            self.names.setdefault(name.lower(), idx)
+        width = len(header)
+        body = rows[start + 1:]
+        is_sectioned = width > 1 and header[1].strip() == 'Header'
+        if is_sectioned:
+            end = next((idx for idx, row in enumerate(body)
+                        if len(row) > 1 and row[1].strip() == 'Header' and row[0] != header[0]), len(body))
+            body = body[:end]
+            is_data = np.fromiter((row[:2] == [header[0], 'Data'] for row in body), dtype=bool, count=len(body))
+        else:
+            is_data = np.fromiter((row != header for row in body), dtype=bool, count=len(body))
+        lengths = np.fromiter(map(len, body), dtype=np.int64, count=len(body))
+        lines = np.arange(start + 2, start + 2 + len(body))
+        self.short_lines = np.array([lines[idx] for idx in np.flatnonzero(is_data & (lengths > 0) & (lengths < width))
+                                     if any(value.strip() for value in body[idx])], dtype=np.int64)
+        full = lengths >= width
+        if not full.all():
+            body = [body[idx] for idx in np.flatnonzero(full)]
+        self.body = body
+        self.rows = is_data[full]
+        self.lines = lines[full][self.rows]
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def find(self, *names: str) -> Optional[int]:
+        return next((self.names[name.lower()] for name in names if name.lower() in self.names), None)
+
+    def get_raw(self, index: int) -> np.ndarray:
+        return np.array(list(map(itemgetter(index), self.body)), dtype=str).reshape(len(self.body))
+
+    def get(self, index: Optional[int], default: str) -> np.ndarray:
+        if index is None or index >= len(self.header):
+            return np.full(len(self), default)
+        return np.char.strip(self.get_raw(index)[self.rows])
+
+    def column(self, *names: str, default: str='') -> np.ndarray:
+        return self.get(self.find(*names), default)
+
+    def next_column(self, *names: str, default: str='') -> np.ndarray:
+        index = self.find(*names)
+        return self.get(None if index is None else index + 1, default)
+
+def parse_floats(values: np.ndarray, decimal_comma: bool=False) -> np.ndarray:
+    if values.size == 0:
+        return np.empty(0)
+    if decimal_comma:
+        cleaned = np.char.replace(values, ',', '.')
+    else:
+        cleaned = values
+        for char in CURRENCY_SYMBOLS:
+            cleaned = np.char.replace(cleaned, char, '')
+    try:
+        return cleaned.astype(np.float64)
+    except ValueError:
+        numbers = np.full(len(cleaned), np.nan)
+        for idx, value in enumerate(cleaned):
+            try:
+                numbers[idx] = float(value)
+            except ValueError:
+                pass
+        return numbers
+
+def parse_dates(values: np.ndarray) -> np.ndarray:
+    if values.size == 0:
+        return np.empty(0, dtype='datetime64[D]')
+    try:
+        return values.astype('datetime64[D]')
+    except ValueError:
+        dates = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+        for idx, value in enumerate(values):
+            try:
+                dates[idx] = np.datetime64(value, 'D')
+            except ValueError:
+                pass
+        return dates
+
+def build_records(result: ImportResult, keep: np.ndarray, columns: dict) -> ImportResult:
+    dates = columns['date'][keep].astype(object)
+    types = [TransType(code) for code in columns['type'][keep]]
+    values = [columns[name][keep].tolist() for name in ('quantity', 'fees', 'price', 'currency', 'symbol',
+                                                         'exchange', 'platform', 'ex_rate', 'ex_fees')]
+    result.records += [{'type': kind, 'date': day, 'quantity': quantity, 'fees': fees, 'price': price,
+                        'currency': currency, 'symbol': symbol, 'exchange': exchange, 'platform': platform,
+                        'ex_rate': ex_rate, 'ex_fees': ex_fees}
+                       for kind, day, quantity, fees, price, currency, symbol, exchange, platform, ex_rate, ex_fees
+                       in zip(types, dates, *values)]
+    result.skipped.sort(key=lambda error: error.line)
+    return result
+
+def keep_valid(result: ImportResult, lines: np.ndarray, keep: np.ndarray,
+               checks: list[tuple[np.ndarray, str]]) -> np.ndarray:
+    for invalid, message in checks:
+        invalid = keep & invalid
+        result.skip(lines[invalid], message)
+        keep = keep & ~invalid
+    return keep
+
+def import_ibkr(path: pathlib.Path, wallet: str='IBKR') -> ImportResult:
+    result = ImportResult(path, ImportFormat.IBKR)
+    table = RawTable(path, lambda row: {'symbol', 'quantity'} <= {name.strip().lower() for name in row}
+                     and any(name.strip().lower() in ('tradeprice', 't. price') for name in row))
+    result.skip(table.short_lines, 'missing cells')
+    detail = np.char.upper(table.column('LevelOfDetail', 'DataDiscriminator', default='EXECUTION'))
+    executions = ('EXECUTION',) if (detail == 'EXECUTION').any() else ('ORDER', 'TRADE')
+    asset_class = table.column('AssetClass', 'Asset Category', default='STK')
+    keep = keep_valid(result, table.lines, np.ones(len(table), dtype=bool),
+                      [(~np.isin(detail, executions), 'summary row'),
+                       (np.isin(np.char.upper(asset_class), ('CASH', 'FOREX')), 'forex trade')])
+    quantity = parse_floats(table.column('Quantity'))
+    price = parse_floats(table.column('TradePrice', 'T. Price'))
+    commission = np.abs(parse_floats(table.column('IBCommission', 'Comm/Fee', default='0')))
+    fx_rate = parse_floats(table.column('FXRateToBase', default='1'))
+    currency = table.column('CurrencyPrimary', 'Currency')
+    commission_currency = table.column('IBCommissionCurrency', default='')
+    digits = [value.replace('-', '')[:8] for value in table.column('TradeDate', 'Date/Time').astype('U10')]
+    dates = parse_dates(np.array([f'{value[:4]}-{value[4:6]}-{value[6:8]}' for value in digits]))
+    keep = keep_valid(result, table.lines, keep,
+                      [(np.isnan(quantity) | (quantity == 0), 'invalid quantity'),
+                       (np.isnan(price), 'invalid price'),
+                       (np.isnat(dates), 'invalid date'),
+                       (np.isnan(fx_rate) | (fx_rate <= 0), 'invalid FX rate')])
+    ex_rate = 1.0 / np.where(keep, fx_rate, 1.0)
+    in_base = (commission_currency != '') & (commission_currency != currency)
+    fees = np.where(in_base, commission * ex_rate, np.nan_to_num(commission))
+    columns = {'type': np.where(quantity > 0, TransType.BUY, TransType.SELL), 'date': dates,
+               'quantity': np.abs(quantity), 'fees': fees, 'price': price, 'currency': currency,
+               'symbol': np.char.lower(table.column('Symbol')), 'exchange': table.column('Exchange', 'ListingExchange',
+                                                                           default='NA'),
+               'platform': np.full(len(table), wallet), 'ex_rate': ex_rate,
+               'ex_fees': np.zeros(len(table))}
+    return build_records(result, keep, columns)
+
+def import_degiro(path: pathlib.Path, wallet: str='Degiro') -> ImportResult:
+    result = ImportResult(path, ImportFormat.DEGIRO)
+    table = RawTable(path, lambda row: {'date', 'product', 'isin', 'quantity'}
+                     <= {name.strip().lower() for name in row})
+    result.skip(table.short_lines, 'missing cells')
+    dates = parse_dates(np.array([f'{value[6:10]}-{value[3:5]}-{value[0:2]}' for value in table.column('Date')]))
+    quantity = parse_floats(table.column('Quantity'), decimal_comma=True)
+    price = parse_floats(table.column('Price'), decimal_comma=True)
+    currency = table.next_column('Price')
+    ex_rate = parse_floats(table.column('Exchange rate', default='1'), decimal_comma=True)
+    ex_rate = np.where(np.isnan(ex_rate) | (ex_rate <= 0), 1.0, ex_rate)
+    fees = np.abs(np.nan_to_num(parse_floats(table.column('Transaction and/or third party fees',
+                                                          'Transaction costs', default='0'),
+                                             decimal_comma=True)))
+    fees_currency = table.next_column('Transaction and/or third party fees', 'Transaction costs')
+    fx_fees = np.abs(np.nan_to_num(parse_floats(table.column('AutoFX Fee', default='0'), decimal_comma=True)))
+    keep = keep_valid(result, table.lines, np.ones(len(table), dtype=bool),
+                      [(np.isnan(quantity) | (quantity == 0), 'invalid quantity'),
+                       (np.isnan(price), 'invalid price'),
+                       (np.isnat(dates), 'invalid date')])
+    in_account = (fees_currency != '') & (fees_currency != currency)
+    columns = {'type': np.where(quantity > 0, TransType.BUY, TransType.SELL), 'date': dates,
+               'quantity': np.abs(quantity), 'fees': np.where(in_account, fees * ex_rate, fees),
+               'price': price, 'currency': currency, 'symbol': np.char.lower(table.column('ISIN')),
+               'exchange': table.column('Reference exchange', 'Reference', default='NA'),
+               'platform': np.full(len(table), wallet), 'ex_rate': ex_rate,
+               'ex_fees': fx_fees * ex_rate}
+    return build_records(result, keep, columns)
+
+COINBASE_TYPES = {'buy': TransType.BUY, 'advanced trade buy': TransType.BUY,
+                  'sell': TransType.SELL, 'advanced trade sell': TransType.SELL,
+                  'deposit': TransType.DEPOSIT, 'withdrawal': TransType.WITHDRAW}
+
+def import_coinbase(path: pathlib.Path, wallet: str='Coinbase') -> ImportResult:
+    result = ImportResult(path, ImportFormat.COINBASE)
+    table = RawTable(path, lambda row: {'timestamp', 'transaction type', 'asset'}
+                     <= {name.strip().lower() for name in row})
+    result.skip(table.short_lines, 'missing cells')
+    kinds = table.column('Transaction Type')
+    names, inverse = np.unique(np.char.lower(kinds), return_inverse=True)
+    codes = np.array([COINBASE_TYPES.get(name, -1) for name in names], dtype=np.int64)[inverse.reshape(-1)]
+    dates = parse_dates(table.column('Timestamp').astype('U10'))
+    quantity = np.abs(parse_floats(table.column('Quantity Transacted')))
+    price = parse_floats(table.column('Spot Price at Transaction', 'Price at Transaction'))
+    fees = np.abs(np.nan_to_num(parse_floats(table.column('Fees and/or Spread', 'Fees', default='0'))))
+    asset = table.column('Asset')
+    currency = table.column('Spot Price Currency', 'Price Currency')
+    is_cash = (codes == TransType.DEPOSIT) | (codes == TransType.WITHDRAW)
+    keep = np.ones(len(table), dtype=bool)
+    unsupported = codes < 0
+    for kind in sorted(set(kinds[unsupported])):
+        result.skip(table.lines[keep & unsupported & (kinds == kind)], f'unsupported type: {kind}')
+    keep &= ~unsupported
+    keep = keep_valid(result, table.lines, keep,
+                      [(np.isnan(quantity) | (quantity == 0), 'invalid quantity'),
+                       (~is_cash & np.isnan(price), 'invalid price'),
+                       (np.isnat(dates), 'invalid date')])
+    columns = {'type': np.where(keep, codes, TransType.BUY), 'date': dates, 'quantity': quantity,
+               'fees': fees, 'price': np.where(is_cash, 1.0, price),
+               'currency': np.where(is_cash, asset, currency),
+               'symbol': np.char.lower(np.where(is_cash, asset, np.char.add(asset, currency))),
+               'exchange': np.full(len(table), 'NA'), 'platform': np.full(len(table), wallet),
+               'ex_rate': np.ones(len(table)), 'ex_fees': np.zeros(len(table))}
+    return build_records(result, keep, columns)
+
+IMPORTERS = {ImportFormat.IBKR: import_ibkr, ImportFormat.DEGIRO: import_degiro,
+             ImportFormat.COINBASE: import_coinbase}
+
+def import_transactions(path: os.PathLike, importer: str, wallet: Optional[str]=None) -> ImportResult:
+    if importer not in IMPORTERS:
+        raise ValueError(f'Unsupported importer: {importer}')
+    if wallet:
+        return IMPORTERS[importer](pathlib.Path(path).expanduser(), wallet)
+    return IMPORTERS[importer](pathlib.Path(path).expanduser())
+
+def load_imports(imports: Optional[list[dict]]) -> list[ImportResult]:
+    return [import_transactions(entry['path'], entry['format'].lower(), entry.get('wallet'))
+            for entry in imports] if imports else []
@@ -0,0 +1,164 @@
+from collections import deque
+from datetime import date
+from typing import Optional
+from src.transactions import Transaction, TransType
+
+QUANTITY_TOLERANCE = 1e-9
+
+class LotPolicy:
+    FIFO = 'fifo'
+    LIFO = 'lifo'
+    AVERAGE = 'average'
+
+LOT_POLICIES = (LotPolicy.FIFO, LotPolicy.LIFO, LotPolicy.AVERAGE)
+
+class Lot:
+    __slots__ = ('symbol', 'ordinal', 'quantity', 'cost')
+
+    def __init__(self, symbol: str, ordinal: int, quantity: float,
+                 cost: float) -> None:
+        self.symbol = symbol
+        self.ordinal = ordinal
+        self.quantity = quantity
+        self.cost = cost
+
+    def get_unit_cost(self) -> float:
+        return self.cost / self.quantity if self.quantity else 0.0
+
+    def take(self, quantity: float) -> 'Lot':
+        cost = self.get_unit_cost() * quantity
+        self.quantity -= quantity
+        self.cost -= cost
+        return Lot(self.symbol, self.ordinal, quantity, cost)
+
+    def __dict__(self) -> dict:
+        return {'symbol': self.symbol,
+                'date': date.fromordinal(self.ordinal).strftime('%Y-%m-%d'),
+                'quantity': self.quantity, 'cost': self.cost,
+                'unit_cost': self.get_unit_cost()}
+
+class RealizedTrade:
+    __slots__ = ('symbol', 'ordinal', 'quantity', 'proceeds', 'cost',
+                 'holding_days', 'unmatched')
+
+    def __init__(self, symbol: str, ordinal: int, quantity: float,
+                 proceeds: float, cost: float, holding_days: float,
+                 unmatched: float) -> None:
+        self.symbol = symbol
+        self.ordinal = ordinal
+        self.quantity = quantity
+        self.proceeds = proceeds
+        self.cost = cost
+        self.holding_days = holding_days
+        self.unmatched = unmatched
+
+    def get_pnl(self) -> float:
+        return self.proceeds - self.cost
+
+    def __dict__(self) -> dict:
+        return {'symbol': self.symbol,
+                'date': date.fromordinal(self.ordinal).strftime('%Y-%m-%d'),
+                'quantity': self.quantity, 'proceeds': self.proceeds,
+                'cost': self.cost, 'pnl': self.get_pnl(),
+                'holding_days': self.holding_days,
+                'unmatched': self.unmatched}
+
+class LotBook:
+
+    def __init__(self, policy: str=LotPolicy.FIFO) -> None:
+        if policy not in LOT_POLICIES:
+            raise ValueError(f'Unsupported lot policy: {policy}')
+        self.policy = policy
+        self.lots = {}
+        self.realized = []
+        self.realized_pnl = {}
+
+    def buy(self, symbol: str, ordinal: int, quantity: float, cost: float) -> None:
+        lots = self.lots.setdefault(symbol, deque())
+        if self.policy == LotPolicy.AVERAGE and lots:
+            pooled = lots[0]
+            total = pooled.quantity + quantity
+            pooled.ordinal = round((pooled.ordinal * pooled.quantity + ordinal * quantity) / total) \
+                if total else ordinal
+            pooled.quantity = total
+            pooled.cost += cost
+            return
+        lots.append(Lot(symbol, ordinal, quantity, cost))
+
+    def sell(self, symbol: str, ordinal: int, quantity: float,
+             proceeds: float) -> RealizedTrade:
+        lots = self.lots.setdefault(symbol, deque())
+        remaining = quantity
+        cost = 0.0
+        weighted_days = 0.0
+        while remaining > QUANTITY_TOLERANCE and lots:
+            lot = lots[-1] if self.policy == LotPolicy.LIFO else lots[0]
+            if lot.quantity <= remaining + QUANTITY_TOLERANCE:
+                taken = lot
+                if self.policy == LotPolicy.LIFO:
+                    lots.pop()
+                else:
+                    lots.popleft()
+            else:
+                taken = lot.take(remaining)
+            cost += taken.cost
+            weighted_days += (ordinal - taken.ordinal) * taken.quantity
+            remaining -= taken.quantity
+        unmatched = max(remaining, 0.0)
+        matched = quantity - unmatched
+        trade = RealizedTrade(symbol, ordinal, quantity, proceeds, cost,
+                              weighted_days / matched if matched > QUANTITY_TOLERANCE else 0.0,
+                              unmatched if unmatched > QUANTITY_TOLERANCE else 0.0)
+        self.realized.append(trade)
+        self.realized_pnl[symbol] = self.realized_pnl.get(symbol, 0.0) + trade.get_pnl()
+        return trade
+
+    def apply(self, transaction: Transaction) -> Optional[RealizedTrade]:
+        if transaction.type == TransType.BUY:
+            self.buy(transaction.symbol, transaction.date.toordinal(),
+                     transaction.quantity, transaction.get_spending())
+        elif transaction.type == TransType.SELL:
+            return self.sell(transaction.symbol, transaction.date.toordinal(),
+                             transaction.quantity, transaction.get_proceeds())
+        return None
+
+    def get_open_lots(self, symbol: Optional[str]=None) -> list[Lot]:
+        if symbol is not None:
+            return list(self.lots.get(symbol, ()))
+        return [lot for lots in self.lots.values() for lot in lots]
+
+    def get_open_quantity(self, symbol: str) -> float:
+        return sum(lot.quantity for lot in self.lots.get(symbol, ()))
+
+    def get_cost_basis(self, symbol: str) -> float:
+        return sum(lot.cost for lot in self.lots.get(symbol, ()))
+
+    def get_realized_pnl(self, symbol: Optional[str]=None) -> float:
+        if symbol is not None:
+            return self.realized_pnl.get(symbol, 0.0)
+        return sum(self.realized_pnl.values())
+
+    def to_state(self) -> dict:
+        return {'policy': self.policy,
+                'lots': {symbol: [[lot.ordinal, lot.quantity, lot.cost] for lot in lots]
+                         for symbol, lots in self.lots.items()},
+                'realized': [[trade.symbol, trade.ordinal, trade.quantity, trade.proceeds,
+                              trade.cost, trade.holding_days, trade.unmatched]
+                             for trade in self.realized],
+                'realized_pnl': self.realized_pnl}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'LotBook':
+        book = cls(state['policy'])
+        book.lots = {symbol: deque(Lot(symbol, *lot) for lot in lots)
+                     for symbol, lots in state['lots'].items()}
+        book.realized = [RealizedTrade(*trade) for trade in state['realized']]
+        book.realized_pnl = dict(state['realized_pnl'])
+        return book
+
+    def get_holding_days(self, symbol: str, ordinal: int) -> float:
+        quantity = self.get_open_quantity(symbol)
+        if quantity <= QUANTITY_TOLERANCE:
+            return 0.0
+        return sum((ordinal - lot.ordinal) * lot.quantity
+                   for lot in self.lots.get(symbol, ())) / quantity
@@ -6,6 +6,11 @@ from typing import Union, Optional, Tuple
 from datetime import date, datetime
 from src.sheets_mngr import get_google_sheet
 from src.csv_mngr import CsvMngr
+from src.cache_mngr import PriceCache, TtlCache
+from src.fetch_mngr import FetchEngine, FetchError
+from src.provider_mngr import MarketDataProvider, YahooProvider, FetchMode, TickerData
+from src.frame_mngr import PriceFrame, Period
+from src.fx_mngr import FxConverter, parse_fx_ticker, get_fx_ticker, is_pair_resolvable
 
 class Interval:
     DAILY = '1d'
@@ -133,40 +138,51 @@ class MarketDataGoogleFull(MarketDataGoogle):
                         self.data_aligned[elm][date]['price'] /= self.currency_conv_rate
                     self.data_aligned[elm][date]['currency'] = 'USD'
 
-class MarketDataYahoo(MarketData):
+class MarketDataFeed(MarketData):
 
     def __init__(self, tickers: list[str],
                  ticker_map: Optional[YFinanceSymbMap],
                  start_date: Union[str, date],
+                 provider: MarketDataProvider,
                  end_date: Optional[Union[str, date]]=None,
                  date_format: str='%Y-%m-%d',
                  interval: Interval=Interval.DAILY,
+                 period: Optional[str]=None,
                  auto_convert_currency: bool=True,
+                 price_cache: Optional[PriceCache]=None,
+                 quote_cache: Optional[TtlCache]=None,
+                 metadata_cache: Optional[TtlCache]=None,
                  **kwargs) -> None:
         super().__init__()
         self.tickers = tickers
+        self.provider = provider
+        self.price_cache = price_cache if provider.requires_network else None
+        self.quote_cache = quote_cache if provider.requires_network else None
+        self.metadata_cache = metadata_cache if provider.requires_network else None
+        self.fetch_errors = []
         self.interval = interval
+        self.period = period if period else \
+            (Period.DAY if interval == Interval.DAILY else Period.MONTH)
         self.date_format = date_format
         self.start_date = self.assign_date(start_date, self.date_format)
         if end_date:
             self.end_date = self.assign_date(end_date, self.date_format)
         else:
             self.end_date = date.today()
-        self.history = {}
+        self.raw_history = {}
         self.currency = {}
         self.current_price = {}
-        self.formulate_history()
+        self.currency_key = None
+        self.formulate_history(self.tickers)
         if auto_convert_currency:
             req_currency = kwargs.get('req_currency', 'NA')
-            self.currency_key = ticker_map.tickerMap.get(req_currency.lower(), None)
-            if not self.currency_key:
-                raise Exception("Currency conversion required, no currency provided.")
-            else:
-                self.convert_currencies(req_currency)
-
-    @staticmethod
-    def get_current_price_ticker(ticker: str) -> float:
-        return float(yf.Ticker(ticker).history(period="1d")['Close'].iloc[-1])
+            if ticker_map:
+                self.currency_key = ticker_map.tickerMap.get(req_currency.lower(), None)
+            self.formulate_fx_history(req_currency.upper())
+        self.daily = self.build_frame()
+        if auto_convert_currency:
+            self.convert_currencies(req_currency)
+        self.history = self.daily.resample(self.period)
 
     @staticmethod
     def assign_date(work_date: Union[str, date],
@@ -177,35 +193,136 @@ class MarketDataYahoo(MarketData):
             ret_date = work_date
         return ret_date
 
-    def formulate_history(self) -> None:
-        for ticker in self.tickers:
-            yf_ticker = yf.Ticker(ticker)
-            history_data_frame = yf_ticker.history(start=self.start_date,
-                                                    end=self.end_date,
-                                                    interval=self.interval)
-            if self.interval == Interval.DAILY:
-                self.history[ticker] = {date.strftime(self.date_format): float(row['Close']) for date, row in history_data_frame.iterrows()}
-            else:
-                self.history[ticker] = {MarketData.convert_date_to_short_str(date=dater.date()): float(row['Close']) for dater, row in history_data_frame.iterrows()}
-            self.currency[ticker] = yf_ticker.info.get("currency", 'NA')
-            self.current_price[ticker] = self.get_current_price_ticker(ticker)
-
-    def convert_currencies(self, req_currency: str) -> None:
-        for ticker in self.tickers:
-            if ticker == self.currency_key:
+    def get_fetch_start(self, ticker: str) -> date:
+        if self.price_cache:
+            return self.price_cache.get_fetch_start(ticker, self.interval,
+                                                    self.start_date)
+        return self.start_date
+
+    def apply_price_cache(self, ticker: str, fetch_start: date,
+                          fetched: dict) -> dict:
+        if self.price_cache:
+            fetched = self.price_cache.merge(ticker, self.interval, fetch_start, fetched,
+                                             self.start_date, self.end_date)
+        start_str = self.start_date.strftime(self.date_format)
+        end_str = self.end_date.strftime(self.date_format)
+        return {d: fetched[d] for d in sorted(fetched) if start_str <= d < end_str}
+
+    def build_frame(self) -> PriceFrame:
+        frame = PriceFrame.from_series({ticker: self.raw_history.get(ticker, {}) for ticker in self.tickers},
+                                       self.date_format,
+                                       Period.DAY if self.interval == Interval.DAILY else Period.WEEK)
+        self.raw_history.clear()
+        return frame
+
+    def get_failed_tickers(self) -> list[str]:
+        return [error.key for error in self.fetch_errors]
+
+    def set_failed_ticker(self, error: FetchError) -> None:
+        self.fetch_errors.append(error)
+        self.raw_history[error.key] = {}
+        self.current_price[error.key] = 0.0
+        self.currency[error.key] = 'NA'
+
+    def is_cache_fresh(self, ticker: str) -> bool:
+        return self.price_cache is not None and self.quote_cache is not None \
+            and self.metadata_cache is not None \
+            and self.quote_cache.is_fresh(ticker) and self.metadata_cache.is_fresh(ticker) \
+            and self.price_cache.get_age(ticker, self.interval) <= self.quote_cache.ttl
+
+    def formulate_history(self, tickers: list[str]) -> None:
+        results = {}
+        fetch_starts = {}
+        for ticker in tickers:
+            if self.is_cache_fresh(ticker):
+                metadata = self.metadata_cache.get(ticker)
+                results[ticker] = TickerData({}, self.quote_cache.get(ticker),
+                                             metadata['currency'], metadata.get('exchange', 'NA'))
+            fetch_starts[ticker] = self.get_fetch_start(ticker)
+        errors = []
+        if len(results) < len(fetch_starts):
+            fetched, errors = self.provider.fetch({ticker: fetch_start for ticker, fetch_start in fetch_starts.items()
+                                                   if ticker not in results},
+                                                  self.end_date, self.interval, self.date_format)
+            results.update(fetched)
+        for ticker, ticker_data in results.items():
+            raw_history = self.apply_price_cache(ticker, fetch_starts[ticker],
+                                                 ticker_data.history)
+            if not raw_history:
+                self.set_failed_ticker(FetchError(ticker, 'no data returned', 1))
                 continue
-            if self.currency[ticker] != req_currency.upper():
-                self.current_price[ticker] *= self.current_price[self.currency_key]
-                self.currency[ticker] = req_currency.upper()
-                for d in self.history[ticker]:
-                        try:
-                            self.history[ticker][d] *= self.history[self.currency_key][d]
-                        except KeyError:
-                            self.history[ticker][d] *= self.current_price[self.currency_key]
+            self.raw_history[ticker] = raw_history
+            self.current_price[ticker] = ticker_data.price if ticker_data.price is not None \
+                else raw_history[max(raw_history)]
+            self.currency[ticker] = ticker_data.currency
+            if self.quote_cache and not self.quote_cache.is_fresh(ticker):
+                self.quote_cache.set(ticker, self.current_price[ticker])
+            if self.metadata_cache and not self.metadata_cache.is_fresh(ticker):
+                self.metadata_cache.set(ticker, {'currency': ticker_data.currency,
+                                                 'exchange': ticker_data.exchange})
+        for error in errors:
+            self.set_failed_ticker(error)
+        for cache in (self.quote_cache, self.metadata_cache):
+            if cache:
+                cache.save()
+
+    def get_required_currencies(self, req_currency: str) -> set[str]:
+        failed_tickers = self.get_failed_tickers()
+        return {self.currency[ticker] for ticker in self.tickers
+                if ticker not in failed_tickers and not parse_fx_ticker(ticker)
+                and self.currency[ticker] not in (req_currency, 'NA')}
+
+    def formulate_fx_history(self, req_currency: str) -> None:
+        if self.currency_key and not parse_fx_ticker(self.currency_key):
+            return
+        pairs = {parse_fx_ticker(ticker) for ticker in self.tickers
+                 if parse_fx_ticker(ticker) and ticker not in self.get_failed_tickers()}
+        attempted = {parse_fx_ticker(ticker) for ticker in self.tickers if parse_fx_ticker(ticker)}
+        fx_tickers = [get_fx_ticker(currency, req_currency)
+                      for currency in sorted(self.get_required_currencies(req_currency))
+                      if not is_pair_resolvable(pairs, currency, req_currency)
+                      and not {(currency, req_currency), (req_currency, currency)} & attempted]
+        if fx_tickers:
+            self.tickers = self.tickers + fx_tickers
+            self.formulate_history(fx_tickers)
 
-    def fetch_history(self) -> dict:
+    def convert_currencies(self, req_currency: str) -> None:
+        req_currency = req_currency.upper()
+        converter = FxConverter(self.daily)
+        converter.add_frame_pairs(self.daily, self.current_price, self.get_failed_tickers())
+        if self.currency_key and not parse_fx_ticker(self.currency_key):
+            for currency in self.get_required_currencies(req_currency):
+                converter.add_pair(currency, req_currency,
+                                   self.daily.column(self.currency_key),
+                                   self.current_price[self.currency_key])
+        currencies = {ticker: self.currency[ticker] for ticker in self.tickers
+                      if ticker != self.currency_key and self.currency[ticker] != 'NA'
+                      and ticker not in self.get_failed_tickers()}
+        unresolved = converter.convert_frame(self.daily, currencies,
+                                             self.current_price, req_currency)
+        if unresolved:
+            raise Exception("503")
+        self.currency.update(currencies)
+
+    def fetch_history(self) -> PriceFrame:
         return self.history
 
+class MarketDataYahoo(MarketDataFeed):
+
+    def __init__(self, tickers: list[str],
+                 ticker_map: Optional[YFinanceSymbMap],
+                 start_date: Union[str, date],
+                 fetch_mode: str=FetchMode.BATCHED,
+                 fetch_engine: Optional[FetchEngine]=None,
+                 **kwargs) -> None:
+        super().__init__(tickers, ticker_map, start_date,
+                         YahooProvider(fetch_mode, fetch_engine,
+                                       kwargs.get('metadata_cache', None)), **kwargs)
+
+    @staticmethod
+    def get_current_price_ticker(ticker: str) -> float:
+        return float(yf.Ticker(ticker).history(period="1d")['Close'].iloc[-1])
+
 class MarketHistory:
 
     def __init__(self, market_data: MarketData) -> None:
@@ -213,7 +330,7 @@ class MarketHistory:
 
 class MarketSymbol:
 
-    def __init__(self, symbol: str, history: dict, price: float,
+    def __init__(self, symbol: str, history: PriceFrame, price: float,
                  currency: str) -> None:
         self.symbol = symbol
         self.history = history
@@ -225,11 +342,12 @@ class MarketSymbol:
         print("Currency:", self.currency)
         print("Price:", self.price)
         print("History:")
-        for h in self.history:
-            print("\t", h, self.history[h])
+        dates, prices = self.history.get_valid(self.symbol)
+        for label, price in zip(self.history.get_labels(dates=dates), prices):
+            print("\t", label, price)
 
     def __str__(self) -> str:
-        return f'Symbol: {self.symbol}, Currency: {self.currency}, Price: {self.price}, History: {self.history}'
+        return f'Symbol: {self.symbol}, Currency: {self.currency}, Price: {self.price}, History: {len(self.history.get_valid(self.symbol)[0])} bars'
 
 class MarketReader:
     def __init__(self, file: os.PathLike,
@@ -312,15 +430,11 @@ def fetch_histories(addresses: dict, suffix: str, destination: str,
     else:
         return True, history_files
 
-def convertSymbListToDicts(symbols: list[MarketSymbol]) -> Tuple[dict, dict]:
+def convertSymbListToDicts(symbols: list[MarketSymbol]) -> Tuple[dict, Optional[PriceFrame]]:
     price_dict = {}
-    history_dict = {}
     for symbol in symbols:
         price_dict[symbol.symbol] = {'price': symbol.price}
-        history_dict[symbol.symbol] = {}
-        for dater in symbol.history:
-            history_dict[symbol.symbol][dater] = {'price' : symbol.history[dater]}
-    return price_dict, history_dict
+    return price_dict, symbols[0].history if symbols else None
 
 def get_yfinance_map(sheet_address: str, directory: os.PathLike,
                      file_name: str='yfinance-map.csv') -> YFinanceSymbMap:
@@ -0,0 +1,164 @@
+import numpy as np
+from typing import Optional, Union
+from src.frame_mngr import PriceFrame
+from src.risk_mngr import get_returns, get_periods_per_year, masked_moments
+
+EIGENVALUE_FLOOR = 1e-10
+WEIGHT_TOLERANCE = 1e-8
+MAX_ITERATIONS = 2000
+ORDER_TOLERANCE = 1e-6
+REFINE_POINTS = 9
+
+class OptimizationTarget:
+    MIN_VARIANCE = 'min-variance'
+    MAX_SHARPE = 'max-sharpe'
+
+OPTIMIZATION_TARGETS = (OptimizationTarget.MIN_VARIANCE, OptimizationTarget.MAX_SHARPE)
+
+def project_capped_simplex(points: np.ndarray, cap: float) -> np.ndarray:
+    count = points.shape[1]
+    breaks = np.concatenate([points - cap, points], axis=1)
+    changes = np.concatenate([np.ones_like(points), -np.ones_like(points)], axis=1)
+    order = np.argsort(breaks, axis=1)
+    breaks = np.take_along_axis(breaks, order, axis=1)
+    active = np.cumsum(np.take_along_axis(changes, order, axis=1), axis=1)
+    totals = count * cap - np.concatenate([np.zeros((len(points), 1)),
+                                           np.cumsum(active[:, :-1] * np.diff(breaks, axis=1), axis=1)],
+                                          axis=1)
+    segment = (totals >= 1.0).sum(axis=1) - 1
+    rows = np.arange(len(points))
+    slope = active[rows, segment]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(slope > 0, (totals[rows, segment] - 1.0) / slope, 0.0)
+    return np.clip(points - (breaks[rows, segment] + shift)[:, None], 0.0, cap)
+
+def estimate_moments(frame: PriceFrame, symbols: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    prices = np.take(frame.values, [frame.symbol_index[symbol] for symbol in symbols], axis=1)
+    returns = get_returns(prices)
+    periods = get_periods_per_year(frame.dates, returns)
+    valid = ~np.isnan(returns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, returns, 0.0).sum(axis=0) / valid.sum(axis=0) * periods
+    covariance, _, _ = masked_moments(returns)
+    covariance = np.nan_to_num(covariance) * np.sqrt(np.outer(periods, periods))
+    eigenvalues, eigenvectors = np.linalg.eigh((covariance + covariance.T) / 2.0)
+    eigenvalues = np.maximum(eigenvalues, EIGENVALUE_FLOOR * max(eigenvalues.max(), 1.0))
+    return np.nan_to_num(mean), (eigenvectors * eigenvalues) @ eigenvectors.T
+
+def get_lipschitz(covariance: np.ndarray) -> float:
+    centered = covariance - covariance.mean(axis=0) - covariance.mean(axis=1)[:, None] + covariance.mean()
+    return max(float(np.linalg.eigvalsh(centered).max()), EIGENVALUE_FLOOR)
+
+class PortfolioOptimizer:
+
+    def __init__(self, frame: PriceFrame, symbols: list[str], weight_cap: float=1.0,
+                 risk_free_rate: float=0.0) -> None:
+        self.symbols = [symbol for symbol in symbols if frame.has_symbol(symbol)]
+        self.weight_cap = min(max(weight_cap, 1.0 / len(self.symbols)), 1.0) if self.symbols else 1.0
+        self.risk_free_rate = risk_free_rate
+        if self.symbols:
+            self.mean, self.covariance = estimate_moments(frame, self.symbols)
+        else:
+            self.mean, self.covariance = np.zeros(0), np.zeros((0, 0))
+        self.lipschitz = get_lipschitz(self.covariance) if self.symbols else 1.0
+        self.frontier_points = 0
+        self.frontier_tradeoffs = np.zeros(0)
+        self.frontier_weights = np.zeros((0, len(self.symbols)))
+
+    def solve(self, tradeoffs: np.ndarray, initial: Optional[np.ndarray]=None) -> np.ndarray:
+        tradeoffs = np.atleast_1d(np.asarray(tradeoffs, dtype=np.float64))
+        step = 1.0 / self.lipschitz
+        start = np.full(len(self.symbols), 1.0 / len(self.symbols)) if initial is None else initial
+        weights = project_capped_simplex(np.broadcast_to(start, (len(tradeoffs), len(self.symbols))),
+                                         self.weight_cap)
+        momentum = weights
+        acceleration = np.ones(len(tradeoffs))
+        active = np.arange(len(tradeoffs))
+        for _ in range(MAX_ITERATIONS):
+            gradient = momentum @ self.covariance - tradeoffs[active, None] * self.mean
+            updated = project_capped_simplex(momentum - step * gradient, self.weight_cap)
+            restart = ((momentum - updated) * (updated - weights[active])).sum(axis=1) > 0
+            acceleration[active[restart]] = 1.0
+            current = acceleration[active]
+            following = (1.0 + np.sqrt(1.0 + 4.0 * current ** 2)) / 2.0
+            momentum = updated + ((current - 1.0) / following)[:, None] * (updated - weights[active])
+            acceleration[active] = following
+            change = np.abs(updated - weights[active]).max(axis=1)
+            weights[active] = updated
+            keep = change >= WEIGHT_TOLERANCE
+            if not keep.all():
+                active, momentum = active[keep], momentum[keep]
+            if not len(active):
+                break
+        return weights
+
+    def get_tradeoffs(self, points: int) -> np.ndarray:
+        scale = float(np.diag(self.covariance).max()) / max(float(np.ptp(self.mean)), EIGENVALUE_FLOOR)
+        return np.r_[0.0, np.geomspace(1e-4, 1e1, max(points - 1, 1)) * scale]
+
+    def get_statistics(self, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        expected = weights @ self.mean
+        volatility = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', weights, self.covariance, weights), 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = (expected - self.risk_free_rate) / volatility
+        return expected, volatility, sharpe
+
+    def sweep(self, points: int=25) -> tuple[np.ndarray, np.ndarray]:
+        if self.frontier_points != points:
+            tradeoffs = self.get_tradeoffs(points)
+            self.frontier_weights = self.solve(tradeoffs)
+            self.frontier_tradeoffs = tradeoffs
+            self.frontier_points = points
+        return self.frontier_tradeoffs, self.frontier_weights
+
+    def min_variance(self) -> np.ndarray:
+        return self.solve(np.zeros(1))[0]
+
+    def max_sharpe(self, points: int=25) -> np.ndarray:
+        tradeoffs, weights = self.sweep(points)
+        best = int(np.argmax(np.nan_to_num(self.get_statistics(weights)[2], nan=-np.inf)))
+        refined = np.linspace(tradeoffs[max(best - 1, 0)], tradeoffs[min(best + 1, len(tradeoffs) - 1)],
+                              REFINE_POINTS)
+        weights = np.vstack([weights[best:best + 1], self.solve(refined, weights[best])])
+        return weights[int(np.argmax(np.nan_to_num(self.get_statistics(weights)[2], nan=-np.inf)))]
+
+    def frontier(self, points: int=25) -> list[dict]:
+        _, weights = self.sweep(points)
+        expected, volatility, sharpe = self.get_statistics(weights)
+        return [dict({'return': float(expected[idx] * 100), 'volatility': float(volatility[idx] * 100),
+                      'sharpe': float(sharpe[idx])},
+                     **{symbol: float(weights[idx, col] * 100) for col, symbol in enumerate(self.symbols)})
+                for idx in range(len(weights))]
+
+    def get_target(self, target: Union[str, dict]) -> dict:
+        if isinstance(target, dict):
+            total = sum(float(weight) for weight in target.values())
+            return {symbol: float(weight) / total for symbol, weight in target.items()} if total > 0 else {}
+        if len(self.symbols) < 2:
+            return {symbol: 1.0 for symbol in self.symbols}
+        if target == OptimizationTarget.MIN_VARIANCE:
+            weights = self.min_variance()
+        elif target == OptimizationTarget.MAX_SHARPE:
+            weights = self.max_sharpe()
+        else:
+            raise ValueError(f'Unsupported optimization target: {target}')
+        return {symbol: float(weight) for symbol, weight in zip(self.symbols, weights)}
+
+def get_rebalancing_orders(portfolio_dict: dict, target: dict,
+                           prices: Optional[dict]=None) -> list[dict]:
+    prices = prices if prices else {}
+    total = sum(data['value'] for data in portfolio_dict.values())
+    orders = []
+    if total <= 0:
+        return orders
+    for symbol in list(portfolio_dict) + [symbol for symbol in target if symbol not in portfolio_dict]:
+        current = portfolio_dict[symbol]['value'] if symbol in portfolio_dict else 0.0
+        price = portfolio_dict[symbol]['current_price'] if symbol in portfolio_dict else prices.get(symbol, np.nan)
+        value = target.get(symbol, 0.0) * total - current
+        if abs(value) <= ORDER_TOLERANCE * total:
+            continue
+        orders.append({'symbol': symbol, 'side': 'buy' if value > 0 else 'sell',
+                       'quantity': abs(value) / price if price and np.isfinite(price) else np.nan,
+                       'value': abs(value), 'current_weight': current / total * 100,
+                       'target_weight': target.get(symbol, 0.0) * 100})
+    return orders
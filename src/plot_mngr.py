@@ -2,6 +2,7 @@ import numpy as np
 from os import PathLike
 from pathlib import Path
 import matplotlib.pyplot as plt
+from src.frame_mngr import PriceFrame, get_month_label
 
 def plot_pie(nums: list[float], fig_path: PathLike, labels: list[str] = None) -> None:
     y = np.array(nums)
@@ -23,17 +24,15 @@ def plot_bar(nums: list[float], fig_path: PathLike, labels: list[str] = None) ->
     plt.savefig(fig_path)
     plt.show()
 
-def plot_monthly_stocks(fig_path: PathLike, data_dict: dict,
+def plot_monthly_stocks(fig_path: PathLike, data_frame: PriceFrame,
                         entry_points: dict, **kwargs) -> list[PathLike]:
     Path(fig_path).parent.mkdir(parents=True, exist_ok=True)
     figs_paths = []
-    for elm in data_dict:
-        x = np.arange(len(data_dict[elm].keys()))
-        names = list(data_dict[elm].keys())
-        y_list = []
-        for i in data_dict[elm].values():
-            y_list.append(i['price'])
-        y = np.array(y_list)
+    symbols = [elm for elm in data_frame.symbols if len(data_frame.get_valid(elm)[0])]
+    for elm in symbols:
+        dates, y = data_frame.get_valid(elm)
+        x = np.arange(len(y))
+        names = data_frame.get_labels(dates=dates)
         fig, ax = plt.subplots(1, 1, figsize=(12, 6))
         ax.plot(x, y, marker='o', linestyle='-', color='b')
         ax.set_xticks(x)
@@ -42,22 +41,17 @@ def plot_monthly_stocks(fig_path: PathLike, data_dict: dict,
         figs_paths.append(fig_path.replace('.png', f'_{elm.lower()}.png'))
         fig.savefig(fig_path.replace('.png', f'_{elm.lower()}.png'))
     fig, ax = plt.subplots(1, 1, figsize=(12, 6))
-    colors = plt.cm.get_cmap('tab10', len(data_dict))
-    for idx, elm in enumerate(data_dict):
+    colors = plt.cm.get_cmap('tab10', len(symbols))
+    for idx, elm in enumerate(symbols):
+        dates, prices = data_frame.get_valid(elm)
+        x = np.arange(len(prices))
+        names = data_frame.get_labels(dates=dates)
+        y = (prices / prices[0]) * 100
         entry = entry_points.get(elm)
-        if entry:
-            entry_x = names.index(entry)
-            base_price = list(data_dict[elm].values())[0]['price']
-            entry_y = (data_dict[elm][entry]['price'] / base_price) * 100
-            ax.plot(entry_x, entry_y, marker='o', markersize=10, color='black')
-        x = np.arange(len(data_dict[elm].keys()))
-        names = list(data_dict[elm].keys())
-        y_list = []
-        for i in data_dict[elm].values():
-            if len(y_list) == 0:
-                base_price = i['price']
-            y_list.append((i['price'] / base_price) * 100)
-        y = np.array(y_list)
+        month_names = data_frame.get_labels(formatter=get_month_label, dates=dates)
+        if entry and entry in month_names:
+            entry_x = month_names.index(entry)
+            ax.plot(entry_x, y[entry_x], marker='o', markersize=10, color='black')
         ax.plot(x, y, marker='o', linestyle='-', label=elm.upper(), color=colors(idx))
     ax.grid(True)
     ax.set_xticks(x)
@@ -119,3 +113,22 @@ def plot_combined(fig_path: PathLike, nums_pie: list[float], nums_bar: list[floa
     if kwargs.get('show', False):
         plt.show()
     return figs_paths
+
+def plot_fan_chart(fig_path: PathLike, labels: list[str], bands: np.ndarray,
+                   **kwargs) -> PathLike:
+    Path(fig_path).parent.mkdir(parents=True, exist_ok=True)
+    x = np.arange(len(labels))
+    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+    middle = len(bands) // 2
+    for idx in range(middle):
+        ax.fill_between(x, bands[idx], bands[-idx - 1], color='b', alpha=0.15 * (idx + 1),
+                        linewidth=0)
+    ax.plot(x, bands[middle], linestyle='-', color='b', label='Median')
+    step = max(len(labels) // 10, 1)
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels(labels[::step])
+    ax.set_title(kwargs.get('title', 'Fan Chart'))
+    ax.grid(True)
+    ax.legend()
+    fig.savefig(fig_path)
+    return fig_path
@@ -1,60 +1,50 @@
-from datetime import datetime
-from typing import Tuple, Union
+import numpy as np
+from datetime import date, datetime
+from typing import Optional, Tuple, Union
 from dateutil.relativedelta import relativedelta
-from src.transactions import Transactions
+from src.transactions import Transactions, TransType
+from src.frame_mngr import PriceFrame
+from src.cache_mngr import CheckpointStore
+from src.valuation_mngr import NavSeries, build_nav
+from src.returns_mngr import ReturnWindow, compute_returns
+from src.lots_mngr import LotBook, LotPolicy, QUANTITY_TOLERANCE
+from src.rollup_mngr import Rollups, RollupKey
+from src.cash_mngr import CashLedger, CashSeries, build_cash_series
 
 class Portfolio:
     def __init__(self, transactions: Transactions, market_data: dict,
-                 is_quiet: bool = False) -> None:
+                 is_quiet: bool = False, lot_policy: str = LotPolicy.FIFO,
+                 checkpoint_store: Optional[CheckpointStore] = None,
+                 ledger_key: Optional[str] = None) -> None:
         self.transactions = transactions
         self.portfolio = {}
         self.total = {'value': 0, 'spending': 0, 'profit_net': 0,
-                      'profit_percent': 0, 'cash_out': 0,
+                      'profit_percent': 0, 'realized_pnl': 0, 'cash_out': 0,
                       'time_interval_days': 0, 'time_interval_months': 0,
                       'time_interval_years': 0, 'avg_day_roi': 0,
                       'avg_month_roi': 0, 'avg_year_roi': 0}
         self.market_data = market_data
         self.wallet_fees = {}
         self.is_quiet = is_quiet
+        self.lot_policy = lot_policy
+        self.lot_book = LotBook(lot_policy)
+        self.cash_ledger = CashLedger()
+        self.cash = None
+        self.rollups = None
+        self.checkpoint_store = checkpoint_store
+        self.ledger_key = ledger_key
+        self.amounts = {}
+        self.bought = set()
+        self.is_incremental = False
+        self.is_unchanged = False
+        self.ledger_digest = None
+        self.nav = None
+        self.returns = {'total': {}, 'symbols': {}}
 
     def calculate(self) -> Tuple[dict, dict]:
-        symbols_dict = {}
-        for transaction in self.transactions.get():
-            transaction = transaction.__dict__()
-            if transaction['symbol'] not in symbols_dict:
-                symbols_dict[transaction['symbol']] = {
-                    'exchange': f'{transaction["exchange"]}',
-                    'amount': 0, 'value': 0, 'spending': 0,
-                    'spending_percent': 0, 'profit_net': 0,
-                    'profit_percent': 0, 'current_price': 0,
-                    'break_even_price': 0, 'price25': 0,
-                    'price50': 0, 'price75': 0,
-                    'price100': 0, 'price150': 0
-                }
-            if transaction['type'] == 'buy':
-                symbols_dict[transaction['symbol']]['amount'] += transaction['quantity']
-                spending = (transaction['price'] * transaction['quantity'] \
-                            + transaction['fees'] + transaction['ex_fees']) \
-                            / transaction['ex_rate']
-                symbols_dict[transaction['symbol']]['spending'] += spending
-                self.total['spending'] += spending
-                symbols_dict[transaction['symbol']]['current_price'] = self.market_data[transaction['symbol']]['price']
-                symbols_dict[transaction['symbol']]['value'] = symbols_dict[transaction['symbol']]['amount'] * symbols_dict[transaction['symbol']]['current_price']
-                symbols_dict[transaction['symbol']]['break_even_price'] = symbols_dict[transaction['symbol']]['spending'] / symbols_dict[transaction['symbol']]['amount']
-                symbols_dict[transaction['symbol']]['profit_net'] = symbols_dict[transaction['symbol']]['value'] - symbols_dict[transaction['symbol']]['spending']
-                symbols_dict[transaction['symbol']]['profit_percent'] = (symbols_dict[transaction['symbol']]['profit_net'] / symbols_dict[transaction['symbol']]['spending']) * 100 if symbols_dict[transaction['symbol']]['spending'] != 0 else 0
-                symbols_dict[transaction['symbol']]['price25'] = symbols_dict[transaction['symbol']]['break_even_price'] * 1.25
-                symbols_dict[transaction['symbol']]['price50'] = symbols_dict[transaction['symbol']]['break_even_price'] * 1.50
-                symbols_dict[transaction['symbol']]['price75'] = symbols_dict[transaction['symbol']]['break_even_price'] * 1.75
-                symbols_dict[transaction['symbol']]['price100'] = symbols_dict[transaction['symbol']]['break_even_price'] * 2.00
-                symbols_dict[transaction['symbol']]['price150'] = symbols_dict[transaction['symbol']]['break_even_price'] * 2.50
-            elif transaction['type'] == 'sell':
-                symbols_dict[transaction['symbol']]['amount'] -= transaction['quantity']
-                symbols_dict[transaction['symbol']]['value'] = symbols_dict[transaction['symbol']]['amount'] * symbols_dict[transaction['symbol']]['current_price']
-                self.total['spending'] -= symbols_dict[transaction['symbol']]['spending']
-
+        symbols_dict = self.aggregate_symbols()
         for p in list(symbols_dict.keys()):
-            if symbols_dict[p]['amount'] == 0:
+            if abs(symbols_dict[p]['amount']) <= QUANTITY_TOLERANCE:
                 del symbols_dict[p]
 
         for symbol in symbols_dict:
@@ -70,9 +60,8 @@ class Portfolio:
         self.total['profit_net'] = self.total['value'] - self.total['spending']
         self.total['profit_percent'] = (self.total['profit_net'] / self.total['spending']) * 100 if self.total['spending'] != 0 else 0
         self.total['cash_out'] = self.total['value'] * 0.95
-        transaction_dates = [datetime.strptime(transaction.__dict__()['date'], '%Y-%m-%d') for transaction in self.transactions.get()]
-        if transaction_dates:
-            min_date = min(transaction_dates)
+        if self.transactions.get():
+            min_date = datetime.combine(self.transactions.get_first_date(), datetime.min.time())
             max_date = datetime.today()
             self.total['time_interval_days'] = (max_date - min_date).days
             self.total['time_interval_months'] = self.total['time_interval_days'] / 30
@@ -89,55 +78,179 @@ class Portfolio:
                 print(f'\t\t{tot.capitalize()}: ', self.total[tot])
         return self.portfolio, self.total
 
+    def rebuild_positions(self) -> None:
+        columns = self.transactions.get_columns()
+        symbol_count = len(columns.symbols)
+        is_buy = columns.types == TransType.BUY
+        is_sell = columns.types == TransType.SELL
+        signed_quantity = np.where(is_buy, columns.quantity,
+                                   np.where(is_sell, -columns.quantity, 0.0))
+        amount = np.bincount(columns.codes, weights=signed_quantity, minlength=symbol_count)
+        has_buy = np.bincount(columns.codes, weights=is_buy, minlength=symbol_count) > 0
+        self.amounts = dict(zip(columns.symbols, amount.tolist()))
+        self.bought = {symbol for symbol, bought in zip(columns.symbols, has_buy) if bought}
+        self.lot_book = LotBook(self.lot_policy)
+        self.cash_ledger = CashLedger()
+        for transaction in self.transactions.get_sorted():
+            self.lot_book.apply(transaction)
+            self.cash_ledger.apply(transaction)
+
+    def restore_positions(self) -> bool:
+        state = self.checkpoint_store.load() if self.checkpoint_store else None
+        transactions = self.transactions.get()
+        if not state or state.get('policy') != self.lot_policy or state['count'] > len(transactions) \
+                or 'trade_rates' not in state.get('cash', {}):
+            return False
+        self.is_unchanged = self.ledger_key is not None and state.get('ledger_key') == self.ledger_key \
+            and state['count'] == len(transactions)
+        if self.is_unchanged:
+            self.ledger_digest = state['digest']
+        else:
+            prefix_digest, self.ledger_digest = self.transactions.get_prefix_digests(state['count'])
+            if prefix_digest != state['digest']:
+                return False
+        new_transactions = sorted(transactions[state['count']:], key=lambda t: t.date)
+        if new_transactions and new_transactions[0].date.toordinal() < state['last_ordinal']:
+            return False
+        self.amounts = state['amounts']
+        self.bought = set(state['bought'])
+        self.lot_book = LotBook.from_state(state['lots'])
+        self.cash_ledger = CashLedger.from_state(state['cash'])
+        for transaction in new_transactions:
+            if transaction.type == TransType.BUY:
+                self.amounts[transaction.symbol] = self.amounts.get(transaction.symbol, 0.0) + transaction.quantity
+                self.bought.add(transaction.symbol)
+            elif transaction.type == TransType.SELL:
+                self.amounts[transaction.symbol] = self.amounts.get(transaction.symbol, 0.0) - transaction.quantity
+            elif not transaction.type.is_cash():
+                self.amounts.setdefault(transaction.symbol, 0.0)
+            self.lot_book.apply(transaction)
+            self.cash_ledger.apply(transaction)
+        return True
+
+    def save_positions(self) -> None:
+        if not self.checkpoint_store or not self.transactions.get() or self.is_unchanged:
+            return
+        if self.ledger_digest is None:
+            _, self.ledger_digest = self.transactions.get_prefix_digests(len(self.transactions.get()))
+        self.checkpoint_store.save({'policy': self.lot_policy,
+                                    'ledger_key': self.ledger_key,
+                                    'count': len(self.transactions.get()),
+                                    'digest': self.ledger_digest,
+                                    'last_ordinal': self.transactions.get_last_date().toordinal(),
+                                    'amounts': self.amounts,
+                                    'bought': sorted(self.bought),
+                                    'lots': self.lot_book.to_state(),
+                                    'cash': self.cash_ledger.to_state()})
+
+    def aggregate_symbols(self) -> dict:
+        self.is_incremental = self.restore_positions()
+        if not self.is_incremental:
+            self.rebuild_positions()
+        self.save_positions()
+        symbols = self.transactions.get_symbols_of_interest()
+        amount = np.array([self.amounts.get(symbol, 0.0) for symbol in symbols], dtype=np.float64)
+        has_buy = [symbol in self.bought for symbol in symbols]
+        cost_basis = np.array([self.lot_book.get_cost_basis(symbol) for symbol in symbols],
+                              dtype=np.float64)
+        self.total['spending'] += float(cost_basis.sum())
+        self.total['realized_pnl'] += self.lot_book.get_realized_pnl()
+        current_price = np.array([self.market_data[symbol]['price'] if bought else 0.0
+                                  for symbol, bought in zip(symbols, has_buy)], dtype=np.float64)
+        value = amount * current_price
+        self.compute_rollups(dict(zip(symbols, current_price.tolist())))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            break_even_price = np.where(amount > QUANTITY_TOLERANCE, cost_basis / amount, 0.0)
+            profit_net = value - cost_basis
+            profit_percent = np.where(cost_basis != 0, profit_net / cost_basis * 100, 0.0)
+        today = date.today().toordinal()
+        symbols_dict = {}
+        for idx, symbol in enumerate(symbols):
+            symbols_dict[symbol] = {
+                'exchange': self.transactions.get_transactions_symbol(symbol)[0].exchange,
+                'amount': float(amount[idx]), 'value': float(value[idx]),
+                'spending': float(cost_basis[idx]),
+                'spending_percent': 0, 'profit_net': float(profit_net[idx]),
+                'profit_percent': float(profit_percent[idx]),
+                'current_price': float(current_price[idx]),
+                'break_even_price': float(break_even_price[idx]),
+                'price25': float(break_even_price[idx] * 1.25),
+                'price50': float(break_even_price[idx] * 1.50),
+                'price75': float(break_even_price[idx] * 1.75),
+                'price100': float(break_even_price[idx] * 2.00),
+                'price150': float(break_even_price[idx] * 2.50),
+                'realized_pnl': self.lot_book.get_realized_pnl(symbol),
+                'holding_days': self.lot_book.get_holding_days(symbol, today)
+            }
+        return symbols_dict
+
+    def compute_rollups(self, prices: dict) -> Rollups:
+        columns = self.transactions.get_columns()
+        self.rollups = Rollups(columns, np.array([prices.get(symbol, 0.0) for symbol in columns.symbols],
+                                                 dtype=np.float64))
+        self.wallet_fees = {wallet: metrics['fees'] + metrics['fx_fees']
+                            for wallet, metrics in self.rollups.get(RollupKey.WALLET).items()}
+        return self.rollups
+
     def compute_spending_history(self) -> dict:
         ret_dict = {}
-        loc_trans = self.transactions.get()
-        loc_trans.sort(key=lambda x: x.__dict__()['date'])
-        first_date = datetime.strptime(loc_trans[0].__dict__()['date'], '%Y-%m-%d').date()
-        last_date = datetime.strptime(loc_trans[-1].__dict__()['date'], '%Y-%m-%d').date()
+        first_date = self.transactions.get_first_date()
+        last_date = self.transactions.get_last_date()
         date_tmp = first_date
         while date_tmp <= last_date:
             month_transactions = []
             ret_dict[convert_date_to_short_str(date=date_tmp)] = 0
             month_transactions = self.transactions.get_transactions_month(date_tmp)
             for transaction in month_transactions:
-                if transaction['type'] == 'buy':
-                    spending = (transaction['price'] * transaction['quantity'] \
-                                + transaction['fees'] + transaction['ex_fees']) \
-                                / transaction['ex_rate']
-                    ret_dict[convert_date_to_short_str(date=date_tmp)] += spending
+                if transaction.type == TransType.BUY:
+                    ret_dict[convert_date_to_short_str(date=date_tmp)] += transaction.get_spending()
             date_tmp += relativedelta(months=1)
         return ret_dict
 
     def get_entry_points_months(self) -> dict:
         entry_points = {}
-        loc_trans = self.transactions.get()
-        loc_trans.sort(key=lambda x: x.__dict__()['date'])
-        for transaction in loc_trans:
-            transaction = transaction.__dict__()
-            if transaction['symbol'] not in entry_points and transaction['type'] == 'buy':
-                entry_points[transaction['symbol']] = convert_date_to_short_str(date=datetime.strptime(transaction['date'], '%Y-%m-%d').date())
+        for transaction in self.transactions.get_sorted():
+            if transaction.symbol not in entry_points and transaction.type == TransType.BUY:
+                entry_points[transaction.symbol] = convert_date_to_short_str(date=transaction.date)
         return entry_points
 
-    def compute_historical_valuation(self, historical_dict: dict) -> dict:
-        ret_data = {}
-        loc_trans = self.transactions.get()
-        loc_trans.sort(key=lambda x : x.__dict__()['date'])
-        first_date = datetime.strptime(loc_trans[0].__dict__()['date'], '%Y-%m-%d').date()
-        last_date = datetime.strptime(loc_trans[-1].__dict__()['date'], '%Y-%m-%d').date()
-        acu_valuation = 0
-        date_itr = first_date
-        while date_itr <= last_date:
-            ret_data[convert_date_to_short_str(date=date_itr)] = acu_valuation
-            for trans_itr in self.transactions.get_transactions_month(date_itr):
-                if trans_itr['type'] == 'buy':
-                    acu_valuation += trans_itr['quantity'] * historical_dict[trans_itr['symbol']][convert_date_to_short_str(date=date_itr)]['price']
-                    ret_data[convert_date_to_short_str(date=date_itr)] = acu_valuation
-                elif trans_itr['type'] == 'sell':
-                    acu_valuation += trans_itr['quantity'] * historical_dict[trans_itr['symbol']][convert_date_to_short_str(date=date_itr)]['price']
-                    ret_data[convert_date_to_short_str(date=date_itr)] = acu_valuation
-            date_itr += relativedelta(months=1)
-        return ret_data
+    def compute_nav(self, history_frame: PriceFrame, currency: str='EUR') -> NavSeries:
+        self.nav = build_nav(self.transactions, history_frame, self.lot_book, date.today())
+        self.compute_cash(history_frame, currency)
+        return self.nav
+
+    def compute_cash(self, history_frame: PriceFrame, currency: str='EUR') -> CashSeries:
+        self.cash = build_cash_series(self.cash_ledger, self.nav.dates, history_frame, currency)
+        self.nav.set_cash(self.cash.total)
+        if len(self.cash.dates):
+            self.total['cash'] = float(self.cash.total[-1])
+            self.total['wealth'] = self.total['value'] + self.total['cash']
+        return self.cash
+
+    def compute_returns(self, windows: Optional[list[str]]=None) -> dict:
+        self.returns = compute_returns(self.transactions, self.nav, windows)
+        for window, result in self.returns['total'].items():
+            self.total[f'twr_{window}'] = result['twr'] * 100
+            self.total[f'xirr_{window}'] = result['xirr'] * 100
+        for symbol in self.portfolio:
+            inception = self.returns['symbols'].get(symbol, {}).get(ReturnWindow.INCEPTION)
+            if inception:
+                self.portfolio[symbol]['twr'] = inception['twr'] * 100
+                self.portfolio[symbol]['xirr'] = inception['xirr'] * 100
+        return self.returns
+
+    def get_returns_rows(self) -> list[dict]:
+        rows = [{'symbol': 'Total', 'window': window, 'twr': result['twr'] * 100, 'xirr': result['xirr'] * 100}
+                for window, result in self.returns['total'].items()]
+        for symbol, windows in self.returns['symbols'].items():
+            rows += [{'symbol': symbol, 'window': window, 'twr': result['twr'] * 100, 'xirr': result['xirr'] * 100}
+                     for window, result in windows.items()]
+        return rows
+
+    def compute_historical_valuation(self, history_frame: PriceFrame) -> dict:
+        if self.nav is None:
+            self.compute_nav(history_frame)
+        return self.nav.to_monthly()
 
     def convert_dicts_to_lists(self) -> Tuple[list, list, list, list, list, list]:
         spending_list = []
@@ -0,0 +1,270 @@
+import os
+import csv
+import json
+import pathlib
+import yfinance as yf
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+from datetime import date, datetime, timedelta
+from src.fetch_mngr import FetchEngine, FetchError, FetchFailed
+from src.cache_mngr import TtlCache
+
+class FetchMode:
+    PER_TICKER = 'per-ticker'
+    BATCHED = 'batched'
+    CONCURRENT = 'concurrent'
+
+class MarketOrigin:
+    YAHOO = 'yahoo'
+    LOCAL = 'local'
+    FIXTURE = 'fixture'
+    GOOGLE = 'google'
+
+class TickerData:
+
+    def __init__(self, history: dict, price: Optional[float],
+                 currency: str, exchange: str='NA') -> None:
+        self.history = history
+        self.price = price
+        self.currency = currency
+        self.exchange = exchange
+
+    def __dict__(self) -> dict:
+        return {'history': self.history, 'price': self.price,
+                'currency': self.currency, 'exchange': self.exchange}
+
+class MarketDataProvider(ABC):
+    requires_network = False
+
+    @abstractmethod
+    def fetch(self, fetch_starts: dict, end_date: date, interval: str,
+              date_format: str) -> Tuple[dict, list[FetchError]]:
+        ...
+
+class YahooProvider(MarketDataProvider):
+    requires_network = True
+
+    def __init__(self, fetch_mode: str=FetchMode.BATCHED,
+                 fetch_engine: Optional[FetchEngine]=None,
+                 metadata_cache: Optional[TtlCache]=None) -> None:
+        self.fetch_mode = fetch_mode
+        self.fetch_engine = fetch_engine if fetch_engine else FetchEngine()
+        self.metadata_cache = metadata_cache
+
+    @staticmethod
+    def load_metadata(ticker: str) -> dict:
+        fast_info = yf.Ticker(ticker).fast_info
+        try:
+            exchange = fast_info['exchange'] or 'NA'
+        except KeyError:
+            exchange = 'NA'
+        return {'currency': fast_info['currency'] or 'NA', 'exchange': exchange}
+
+    def get_cached_metadata(self, ticker: str) -> Optional[dict]:
+        return self.metadata_cache.get(ticker) if self.metadata_cache else None
+
+    def get_metadata(self, ticker: str) -> dict:
+        metadata = self.get_cached_metadata(ticker)
+        if metadata is None:
+            metadata = self.load_metadata(ticker)
+            if self.metadata_cache:
+                self.metadata_cache.set(ticker, metadata)
+        return metadata
+
+    def fetch_metadata(self, tickers: list[str]) -> Tuple[dict, list[FetchError]]:
+        metadata = {}
+        for ticker in tickers:
+            cached = self.get_cached_metadata(ticker)
+            if cached is not None:
+                metadata[ticker] = cached
+        fetched, errors = self.fetch_engine.run(self.load_metadata,
+                                                [ticker for ticker in tickers if ticker not in metadata])
+        if self.metadata_cache:
+            for ticker, entry in fetched.items():
+                self.metadata_cache.set(ticker, entry)
+        metadata.update(fetched)
+        return metadata, errors
+
+    def fetch(self, fetch_starts: dict, end_date: date, interval: str,
+              date_format: str) -> Tuple[dict, list[FetchError]]:
+        if self.fetch_mode == FetchMode.BATCHED:
+            return self.fetch_batched(fetch_starts, end_date, interval, date_format)
+        return self.fetch_engine.run(
+            lambda ticker: self.fetch_ticker(ticker, fetch_starts[ticker], end_date,
+                                             interval, date_format),
+            fetch_starts.keys(), None if self.fetch_mode == FetchMode.CONCURRENT else 1)
+
+    def fetch_ticker(self, ticker: str, fetch_start: date, end_date: date,
+                     interval: str, date_format: str) -> TickerData:
+        history_data_frame = yf.Ticker(ticker).history(start=fetch_start,
+                                               end=end_date + timedelta(days=1),
+                                               interval=interval,
+                                               timeout=self.fetch_engine.timeout)
+        if history_data_frame.empty:
+            raise ValueError(f'no data returned for {ticker}')
+        closes = history_data_frame['Close'].dropna()
+        metadata = self.get_metadata(ticker)
+        return TickerData({dater.strftime(date_format): float(close) for dater, close in closes.items()},
+                          float(closes.iloc[-1]) if len(closes) else None,
+                          metadata['currency'], metadata.get('exchange', 'NA'))
+
+    def fetch_batched(self, fetch_starts: dict, end_date: date, interval: str,
+                      date_format: str) -> Tuple[dict, list[FetchError]]:
+        tickers = list(fetch_starts.keys())
+        batch_start = min(fetch_starts.values())
+        try:
+            data_frame, _ = self.fetch_engine.call_with_retries(
+                lambda _: yf.download(tickers, start=batch_start,
+                                      end=end_date + timedelta(days=1),
+                                      interval=interval, group_by='ticker',
+                                      auto_adjust=True, progress=False,
+                                      timeout=self.fetch_engine.timeout),
+                'batch')
+        except FetchFailed as exc:
+            return {}, [FetchError(ticker, f'{type(exc.cause).__name__}: {exc.cause}', exc.attempts)
+                        for ticker in tickers]
+        metadata, errors = self.fetch_metadata(tickers)
+        results = {}
+        for ticker in tickers:
+            if ticker not in metadata:
+                continue
+            closes = self.get_batch_closes(data_frame, ticker)
+            results[ticker] = TickerData({dater.strftime(date_format): float(close) for dater, close in closes.items()},
+                                         float(closes.iloc[-1]) if len(closes) else None,
+                                         metadata[ticker]['currency'],
+                                         metadata[ticker].get('exchange', 'NA'))
+        return results, errors
+
+    @staticmethod
+    def get_batch_closes(data_frame, ticker: str):
+        if data_frame.columns.nlevels == 1:
+            return data_frame['Close'].dropna()
+        if ticker not in data_frame.columns.get_level_values(0):
+            return data_frame.iloc[0:0, 0]
+        return data_frame[ticker]['Close'].dropna()
+
+class CsvDirectoryProvider(MarketDataProvider):
+
+    def __init__(self, directory: os.PathLike, file_date_format: str='%Y-%m-%d') -> None:
+        self.directory = pathlib.Path(directory)
+        self.file_date_format = file_date_format
+        self.currencies = {}
+        self.exchanges = {}
+        metadata_file = self.directory / 'metadata.csv'
+        if metadata_file.exists():
+            with open(metadata_file, mode='r', newline='') as file:
+                for row in csv.DictReader(file):
+                    self.currencies[row['ticker']] = row['currency']
+                    self.exchanges[row['ticker']] = row.get('exchange') or 'NA'
+
+    def load_rows(self, ticker: str) -> list[dict]:
+        csv_file = self.directory / f'{ticker}.csv'
+        if csv_file.exists():
+            with open(csv_file, mode='r', newline='') as file:
+                return [{key.lower(): value for key, value in row.items()}
+                        for row in csv.DictReader(file)]
+        parquet_file = self.directory / f'{ticker}.parquet'
+        if parquet_file.exists():
+            import pandas as pd
+            data_frame = pd.read_parquet(parquet_file)
+            data_frame.columns = [str(col).lower() for col in data_frame.columns]
+            if 'date' not in data_frame.columns:
+                data_frame = data_frame.reset_index().rename(columns={'index': 'date'})
+                data_frame.columns = [str(col).lower() for col in data_frame.columns]
+            data_frame['date'] = pd.to_datetime(data_frame['date']).dt.strftime(self.file_date_format)
+            return data_frame.to_dict('records')
+        raise FileNotFoundError(f'no market file for {ticker} in {self.directory}')
+
+    def fetch(self, fetch_starts: dict, end_date: date, interval: str,
+              date_format: str) -> Tuple[dict, list[FetchError]]:
+        results = {}
+        errors = []
+        for ticker, fetch_start in fetch_starts.items():
+            try:
+                rows = self.load_rows(ticker)
+            except FileNotFoundError as exc:
+                errors.append(FetchError(ticker, str(exc), 1))
+                continue
+            history = {}
+            currency = self.currencies.get(ticker, 'NA')
+            for row in rows:
+                bar_date = datetime.strptime(str(row['date']).split()[0], self.file_date_format).date()
+                if row.get('close') in (None, '') or not fetch_start <= bar_date <= end_date:
+                    continue
+                history[bar_date.strftime(date_format)] = float(row['close'])
+                currency = row.get('currency') or currency
+            results[ticker] = TickerData(history, history[max(history)] if history else None, currency,
+                                         self.exchanges.get(ticker, 'NA'))
+        return results, errors
+
+class FixtureProvider(MarketDataProvider):
+
+    def __init__(self, fixture_file: os.PathLike) -> None:
+        self.fixture_file = pathlib.Path(fixture_file)
+        with open(self.fixture_file, mode='r') as file:
+            self.fixture = json.load(file)
+
+    def fetch(self, fetch_starts: dict, end_date: date, interval: str,
+              date_format: str) -> Tuple[dict, list[FetchError]]:
+        results = {}
+        errors = []
+        recorded = self.fixture.get(interval, {})
+        for ticker, fetch_start in fetch_starts.items():
+            if ticker not in recorded:
+                errors.append(FetchError(ticker, f'not recorded in {self.fixture_file}', 1))
+                continue
+            start_str = fetch_start.strftime(date_format)
+            end_str = end_date.strftime(date_format)
+            results[ticker] = TickerData({d: v for d, v in recorded[ticker]['history'].items()
+                                          if start_str <= d <= end_str},
+                                         recorded[ticker]['price'],
+                                         recorded[ticker]['currency'],
+                                         recorded[ticker].get('exchange', 'NA'))
+        return results, errors
+
+class FixtureRecorder(MarketDataProvider):
+
+    def __init__(self, provider: MarketDataProvider,
+                 fixture_file: os.PathLike) -> None:
+        self.provider = provider
+        self.requires_network = provider.requires_network
+        self.fixture_file = pathlib.Path(fixture_file)
+
+    def fetch(self, fetch_starts: dict, end_date: date, interval: str,
+              date_format: str) -> Tuple[dict, list[FetchError]]:
+        results, errors = self.provider.fetch(fetch_starts, end_date, interval, date_format)
+        fixture = {}
+        if self.fixture_file.exists():
+            with open(self.fixture_file, mode='r') as file:
+                fixture = json.load(file)
+        recorded = fixture.setdefault(interval, {})
+        for ticker, ticker_data in results.items():
+            entry = recorded.setdefault(ticker, {'history': {}})
+            entry['history'].update(ticker_data.history)
+            entry['price'] = ticker_data.price
+            entry['currency'] = ticker_data.currency
+            entry['exchange'] = ticker_data.exchange
+        self.fixture_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.fixture_file, mode='w') as file:
+            json.dump(fixture, file, indent=1, sort_keys=True)
+        return results, errors
+
+def create_market_provider(origin: str, fetch_mode: str=FetchMode.BATCHED,
+                           fetch_engine: Optional[FetchEngine]=None,
+                           metadata_cache: Optional[TtlCache]=None,
+                           directory: Optional[os.PathLike]=None,
+                           fixture_file: Optional[os.PathLike]=None,
+                           record_file: Optional[os.PathLike]=None) -> MarketDataProvider:
+    if origin == MarketOrigin.YAHOO:
+        provider = YahooProvider(fetch_mode, fetch_engine, metadata_cache)
+    elif origin == MarketOrigin.LOCAL and directory:
+        provider = CsvDirectoryProvider(directory)
+    elif origin == MarketOrigin.FIXTURE and fixture_file:
+        provider = FixtureProvider(fixture_file)
+    elif origin == MarketOrigin.GOOGLE:
+        raise Exception("299")
+    else:
+        raise Exception("417")
+    if record_file:
+        provider = FixtureRecorder(provider, record_file)
+    return provider
@@ -1,5 +1,6 @@
 import pathlib
 from os import PathLike
+from typing import Optional
 from jinja2 import Environment, FileSystemLoader
 
 def generate_misc_tables_html(symbols_map: str, entry_points: str,
@@ -119,7 +120,15 @@ def generate_html_report(total_dict: dict, entry_points: dict,
                          figs_paths_stats: list[PathLike],
                          transactions_list: list, historical_valuation: dict,
                          req_path: PathLike,
-                         sub_dir: PathLike) -> None:
+                         sub_dir: PathLike,
+                         risk_dict: Optional[dict]=None,
+                         correlation_dict: Optional[dict]=None,
+                         cash_balances: Optional[list[dict]]=None,
+                         rollups_dict: Optional[dict]=None,
+                         allocation_dict: Optional[dict]=None,
+                         rebalance_orders: Optional[list[dict]]=None,
+                         projection_rows: Optional[list[dict]]=None,
+                         projection_fig: Optional[PathLike]=None) -> None:
     generate_transactions_html(transactions_list, sub_dir)
     generate_historical_report(figs_paths_stocks[1:], sub_dir)
     entries_html = ''
@@ -188,6 +197,191 @@ def generate_html_report(total_dict: dict, entry_points: dict,
             {% endfor %}
         </tbody>
     </table>
+    {% if rollups_dict %}
+    <h2>Rollups</h2>
+    {% for group, rollup in rollups_dict.items() %}
+    <h3>By {{ group | capitalize }}</h3>
+    <table>
+        <thead>
+            <tr>
+                <th>{{ group | capitalize }}</th>
+                <th>Trades</th>
+                <th>Value</th>
+                <th>Spending</th>
+                <th>Proceeds</th>
+                <th>Fees</th>
+                <th>FX Fees</th>
+                <th>Profit/Loss</th>
+                <th>Fee Drag (%)</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for name, data in rollup.items() %}
+            <tr>
+                <td>{{ name }}</td>
+                <td>{{ data['trades'] }}</td>
+                <td>{{ '%.2f' % data['value'] }}</td>
+                <td>{{ '%.2f' % data['spending'] }}</td>
+                <td>{{ '%.2f' % data['proceeds'] }}</td>
+                <td>{{ '%.2f' % data['fees'] }}</td>
+                <td>{{ '%.2f' % data['fx_fees'] }}</td>
+                <td>{{ '%.2f' % data['pnl'] }}</td>
+                <td>{{ '%.2f' % data['fee_drag'] }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endfor %}
+    {% endif %}
+    {% if cash_balances %}
+    <h2>Cash</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Wallet</th>
+                <th>Currency</th>
+                <th>Balance</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for row in cash_balances %}
+            <tr>
+                <td>{{ row['wallet'] }}</td>
+                <td>{{ row['currency'] }}</td>
+                <td>{{ '%.2f' % row['balance'] }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+    {% if risk_dict %}
+    <h2>Risk</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Symbol</th>
+                <th>Volatility (%)</th>
+                <th>Rolling Volatility (%)</th>
+                <th>Max Drawdown (%)</th>
+                <th>Drawdown Days</th>
+                <th>Sharpe</th>
+                <th>Sortino</th>
+                <th>Beta</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for symbol, data in risk_dict.items() %}
+            <tr>
+                <td>{{ symbol }}</td>
+                <td>{{ '%.2f' % data['volatility'] }}</td>
+                <td>{{ '%.2f' % data['rolling_volatility'] }}</td>
+                <td>{{ '%.2f' % data['max_drawdown'] }}</td>
+                <td>{{ data['drawdown_days'] }}</td>
+                <td>{{ '%.2f' % data['sharpe'] }}</td>
+                <td>{{ '%.2f' % data['sortino'] }}</td>
+                <td>{{ '%.2f' % data['beta'] }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+    {% if correlation_dict %}
+    <h3>Correlation</h3>
+    <table>
+        <thead>
+            <tr>
+                <th></th>
+                {% for symbol in correlation_dict %}
+                <th>{{ symbol }}</th>
+                {% endfor %}
+            </tr>
+        </thead>
+        <tbody>
+            {% for symbol, row in correlation_dict.items() %}
+            <tr>
+                <td>{{ symbol }}</td>
+                {% for value in row.values() %}
+                <td>{{ '%.2f' % value }}</td>
+                {% endfor %}
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+    {% if allocation_dict %}
+    <h2>Allocation</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Symbol</th>
+                <th>Current (%)</th>
+                <th>Minimum Variance (%)</th>
+                <th>Maximum Sharpe (%)</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for symbol, data in allocation_dict.items() %}
+            <tr>
+                <td>{{ symbol }}</td>
+                <td>{{ '%.2f' % data['current'] }}</td>
+                <td>{{ '%.2f' % data['min_variance'] }}</td>
+                <td>{{ '%.2f' % data['max_sharpe'] }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+    {% if rebalance_orders %}
+    <h3>Rebalancing Orders</h3>
+    <table>
+        <thead>
+            <tr>
+                <th>Symbol</th>
+                <th>Side</th>
+                <th>Quantity</th>
+                <th>Value</th>
+                <th>Current (%)</th>
+                <th>Target (%)</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for order in rebalance_orders %}
+            <tr>
+                <td>{{ order['symbol'] }}</td>
+                <td>{{ order['side'] | capitalize }}</td>
+                <td>{{ '%.4f' % order['quantity'] }}</td>
+                <td>{{ '%.2f' % order['value'] }}</td>
+                <td>{{ '%.2f' % order['current_weight'] }}</td>
+                <td>{{ '%.2f' % order['target_weight'] }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+    {% if projection_rows %}
+    <h2>Projection</h2>
+    <table>
+        <thead>
+            <tr>
+                {% for column in projection_rows[0] %}
+                <th>{{ column }}</th>
+                {% endfor %}
+            </tr>
+        </thead>
+        <tbody>
+            {% for row in projection_rows %}
+            <tr>
+                {% for column, value in row.items() %}
+                <td>{{ value if column == 'date' else '%.2f' % value }}</td>
+                {% endfor %}
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% if projection_fig %}
+    <img src="{{ projection_fig | abs }}" alt="Projection Fan Chart">
+    {% endif %}
+    {% endif %}
     <h2>Plots</h2>
     <div>
         <h3>Statistics Plots</h3>
@@ -218,6 +412,14 @@ def generate_html_report(total_dict: dict, entry_points: dict,
         total=total_html,
         default_currency=def_currency,
         portfolio_dict=portfolio_dict,
+        risk_dict=risk_dict,
+        correlation_dict=correlation_dict,
+        cash_balances=cash_balances,
+        rollups_dict=rollups_dict,
+        allocation_dict=allocation_dict,
+        rebalance_orders=rebalance_orders,
+        projection_rows=projection_rows,
+        projection_fig=projection_fig,
         history_report_dir=f'{sub_dir}figs_historical.html',
         overview_history_fig=figs_paths_stocks[0],
         plots_stats=figs_paths_stats,
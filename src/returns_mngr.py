@@ -0,0 +1,156 @@
+import numpy as np
+from datetime import date
+from typing import Optional, Tuple
+from src.transactions import Transactions, TransType
+from src.valuation_mngr import NavSeries
+
+DAYS_PER_YEAR = 365.0
+
+class ReturnWindow:
+    MONTH = '1m'
+    QUARTER = '3m'
+    YTD = 'ytd'
+    YEAR = '1y'
+    THREE_YEARS = '3y'
+    INCEPTION = 'inception'
+
+RETURN_WINDOWS = (ReturnWindow.MONTH, ReturnWindow.QUARTER, ReturnWindow.YTD, ReturnWindow.YEAR,
+                  ReturnWindow.THREE_YEARS, ReturnWindow.INCEPTION)
+
+def get_window_start(dates: np.ndarray, window: str) -> int:
+    end = date.fromordinal(int(dates[-1]))
+    if window == ReturnWindow.INCEPTION:
+        return 0
+    if window == ReturnWindow.YTD:
+        start = date(end.year, 1, 1).toordinal()
+    elif window == ReturnWindow.MONTH:
+        start = dates[-1] - 30
+    elif window == ReturnWindow.QUARTER:
+        start = dates[-1] - 91
+    elif window == ReturnWindow.YEAR:
+        start = dates[-1] - 365
+    elif window == ReturnWindow.THREE_YEARS:
+        start = dates[-1] - 3 * 365
+    else:
+        raise ValueError(f'Unsupported return window: {window}')
+    return int(np.searchsorted(dates, start))
+
+def build_flows(transactions: Transactions, nav: NavSeries) -> np.ndarray:
+    columns = transactions.get_columns()
+    flows = np.zeros((len(nav.dates), len(nav.symbols)))
+    if not len(columns) or not len(nav.dates):
+        return flows
+    is_buy = columns.types == TransType.BUY
+    is_sell = columns.types == TransType.SELL
+    amounts = np.where(is_buy, columns.spending, np.where(is_sell, -columns.proceeds, 0.0))
+    rows = columns.ordinals - nav.dates[0]
+    flows.ravel()[:] = np.bincount(rows * len(nav.symbols) + columns.codes, weights=amounts,
+                                   minlength=flows.size)
+    return flows
+
+def time_weighted_returns(values: np.ndarray, flows: np.ndarray,
+                          start: int, end: int) -> np.ndarray:
+    previous = values[start - 1:end] if start > 0 else \
+        np.vstack([np.zeros((1, values.shape[1])), values[:end]])
+    window_flows = flows[start:end + 1]
+    base = previous + np.maximum(window_flows, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(base > 0, (values[start:end + 1] - np.minimum(window_flows, 0.0)) / base, 1.0)
+    return np.prod(growth, axis=0) - 1.0
+
+def npv(rates: np.ndarray, cash_flows: np.ndarray,
+        times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    discount = np.exp(-times * np.log1p(rates)[:, None])
+    value = (cash_flows * discount).sum(axis=1)
+    derivative = -(times * cash_flows * discount).sum(axis=1) / (1.0 + rates)
+    return value, derivative
+
+def xirr(cash_flows: np.ndarray, times: np.ndarray, guess: float=0.1,
+         tolerance: float=1e-10, max_iterations: int=50) -> np.ndarray:
+    cash_flows = np.atleast_2d(cash_flows)
+    times = np.broadcast_to(times, cash_flows.shape)
+    rates = np.full(cash_flows.shape[0], guess)
+    solvable = (cash_flows > 0).any(axis=1) & (cash_flows < 0).any(axis=1)
+    converged = ~solvable
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+        value, derivative = npv(rates[active], cash_flows[active], times[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(derivative != 0, value / derivative, np.nan)
+        updated = rates[active] - step
+        bad = ~np.isfinite(updated) | (updated <= -1.0)
+        updated[bad] = np.nan
+        done = ~bad & (np.abs(step) < tolerance * np.maximum(1.0, np.abs(updated)))
+        rates[active] = updated
+        indices = np.flatnonzero(active)
+        converged[indices[done]] = True
+        converged[indices[bad]] = True
+    retry = solvable & (~converged | ~np.isfinite(rates))
+    if retry.any():
+        rates[retry] = bisect_xirr(cash_flows[retry], times[retry])
+    rates[~solvable] = np.nan
+    return rates
+
+def bisect_xirr(cash_flows: np.ndarray, times: np.ndarray,
+                low: float=-0.9999, high: float=1e4,
+                iterations: int=200) -> np.ndarray:
+    lows = np.full(cash_flows.shape[0], low)
+    highs = np.full(cash_flows.shape[0], high)
+    low_values, _ = npv(lows, cash_flows, times)
+    high_values, _ = npv(highs, cash_flows, times)
+    bracketed = np.sign(low_values) != np.sign(high_values)
+    for _ in range(iterations):
+        middles = (lows + highs) / 2.0
+        middle_values, _ = npv(middles, cash_flows, times)
+        same_side = np.sign(middle_values) == np.sign(low_values)
+        lows = np.where(same_side, middles, lows)
+        low_values = np.where(same_side, middle_values, low_values)
+        highs = np.where(same_side, highs, middles)
+    return np.where(bracketed, (lows + highs) / 2.0, np.nan)
+
+def money_weighted_returns(values: np.ndarray, flows: np.ndarray, dates: np.ndarray,
+                           start: int, end: int) -> np.ndarray:
+    window_flows = flows[start:end + 1]
+    opening = values[start - 1] if start > 0 else np.zeros(values.shape[1])
+    opening_date = dates[start - 1] if start > 0 else dates[0]
+    event_rows, column_index = np.nonzero(window_flows)
+    order = np.argsort(column_index, kind='stable')
+    event_rows, column_index = event_rows[order], column_index[order]
+    counts = np.bincount(column_index, minlength=values.shape[1])
+    positions = np.arange(len(column_index)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    columns = np.arange(values.shape[1])
+    cash_flows = np.zeros((values.shape[1], counts.max() + 2))
+    times = np.zeros_like(cash_flows)
+    cash_flows[:, 0] = -opening
+    cash_flows[column_index, positions] = -window_flows[event_rows, column_index]
+    times[column_index, positions] = dates[start + event_rows] - opening_date
+    cash_flows[columns, counts + 1] = values[end]
+    times[columns, counts + 1] = dates[end] - opening_date
+    return xirr(cash_flows, times / DAYS_PER_YEAR)
+
+def compute_returns(transactions: Transactions, nav: NavSeries,
+                    windows: Optional[list[str]]=None) -> dict:
+    windows = windows if windows else [ReturnWindow.YTD, ReturnWindow.YEAR, ReturnWindow.INCEPTION]
+    returns = {'total': {}, 'symbols': {symbol: {} for symbol in nav.symbols}}
+    if not len(nav.dates):
+        return returns
+    flows = build_flows(transactions, nav)
+    priced = ~np.isnan(nav.prices)
+    flows = np.where(priced, flows, 0.0)
+    unpriced = ~priced[-1]
+    values = np.column_stack([nav.values, nav.values.sum(axis=1)])
+    flows = np.column_stack([flows, flows.sum(axis=1)])
+    end = len(nav.dates) - 1
+    for window in windows:
+        start = get_window_start(nav.dates, window)
+        twr = time_weighted_returns(values, flows, start, end)
+        mwr = np.r_[money_weighted_returns(values[:, :-1], flows[:, :-1], nav.dates, start, end),
+                    money_weighted_returns(values[:, -1:], flows[:, -1:], nav.dates, start, end)]
+        twr[:-1][unpriced] = np.nan
+        mwr[:-1][unpriced] = np.nan
+        returns['total'][window] = {'twr': float(twr[-1]), 'xirr': float(mwr[-1])}
+        for idx, symbol in enumerate(nav.symbols):
+            returns['symbols'][symbol][window] = {'twr': float(twr[idx]), 'xirr': float(mwr[idx])}
+    return returns
@@ -0,0 +1,133 @@
+import numpy as np
+from datetime import date
+from typing import Optional
+from src.frame_mngr import PriceFrame
+from src.valuation_mngr import fill_forward
+
+DAYS_PER_YEAR = 365.0
+
+def get_returns(prices: np.ndarray) -> np.ndarray:
+    carried = np.vstack([np.full((1, prices.shape[1]), np.nan), fill_forward(prices)[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.isnan(prices) | (carried <= 0), np.nan, prices / carried - 1.0)
+
+def get_periods_per_year(dates: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    span = max(float(dates[-1] - dates[0]), 1.0) / DAYS_PER_YEAR if len(dates) else 1.0
+    return np.maximum((~np.isnan(returns)).sum(axis=0) / span, 1.0)
+
+def rolling_volatility(returns: np.ndarray, window: int,
+                       periods_per_year: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(returns)
+    padded = np.zeros((1, returns.shape[1]))
+    sums = np.vstack([padded, np.cumsum(np.where(valid, returns, 0.0), axis=0)])
+    squares = np.vstack([padded, np.cumsum(np.where(valid, returns ** 2, 0.0), axis=0)])
+    counts = np.vstack([padded, np.cumsum(valid, axis=0)])
+    starts = np.maximum(np.arange(1, len(returns) + 1) - window, 0)
+    ends = np.arange(1, len(returns) + 1)
+    count = counts[ends] - counts[starts]
+    total = sums[ends] - sums[starts]
+    total_squares = squares[ends] - squares[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (total_squares - total ** 2 / count) / (count - 1)
+    variance = np.where(count >= 2, np.maximum(variance, 0.0), np.nan)
+    return np.sqrt(variance * periods_per_year)
+
+def get_drawdowns(dates: np.ndarray, prices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    filled = fill_forward(prices)
+    peaks = np.fmax.accumulate(filled, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, filled / peaks - 1.0, np.nan)
+    peak_rows = np.where(filled >= peaks, np.arange(len(dates))[:, None], -1)
+    np.maximum.accumulate(peak_rows, axis=0, out=peak_rows)
+    durations = np.where(peak_rows >= 0, dates[:, None] - dates[np.maximum(peak_rows, 0)], 0)
+    max_drawdowns = np.where(np.isnan(drawdowns), np.inf, drawdowns).min(axis=0, initial=np.inf)
+    return np.where(np.isinf(max_drawdowns), np.nan, max_drawdowns), durations.max(axis=0, initial=0)
+
+def masked_moments(first: np.ndarray,
+                   second: Optional[np.ndarray]=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    first_valid = (~np.isnan(first)).astype(np.float64)
+    first_values = np.nan_to_num(first)
+    if second is None:
+        second_valid, second_values = first_valid, first_values
+    else:
+        second_valid = (~np.isnan(second)).astype(np.float64)
+        second_values = np.nan_to_num(second)
+    counts = first_valid.T @ second_valid
+    first_sums = first_values.T @ second_valid
+    first_squares = (first_values ** 2).T @ second_valid
+    if second is None:
+        second_sums, second_squares = first_sums.T, first_squares.T
+    else:
+        second_sums = first_valid.T @ second_values
+        second_squares = first_valid.T @ second_values ** 2
+    products = first_values.T @ second_values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products / counts - first_sums * second_sums / counts ** 2
+        first_variance = first_squares / counts - (first_sums / counts) ** 2
+        second_variance = second_squares / counts - (second_sums / counts) ** 2
+    return covariance, first_variance, second_variance
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    covariance, first_variance, second_variance = masked_moments(returns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.sqrt(first_variance * second_variance)
+    np.fill_diagonal(correlation, np.where(np.isnan(np.diag(correlation)), np.nan, 1.0))
+    return np.clip(correlation, -1.0, 1.0)
+
+def get_betas(returns: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    covariance, _, benchmark_variance = masked_moments(returns, benchmark[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (covariance / benchmark_variance)[:, 0]
+
+class RiskReport:
+
+    def __init__(self, frame: PriceFrame, symbols: list[str], benchmark: Optional[str]=None,
+                 window: int=21, risk_free_rate: float=0.0) -> None:
+        self.symbols = [symbol for symbol in symbols if frame.has_symbol(symbol)]
+        if benchmark and frame.has_symbol(benchmark) and benchmark not in self.symbols:
+            self.symbols.append(benchmark)
+        self.benchmark = benchmark if benchmark in self.symbols else None
+        self.dates = frame.dates
+        self.window = window
+        prices = np.take(frame.values, [frame.symbol_index[symbol] for symbol in self.symbols], axis=1)
+        self.returns = get_returns(prices)
+        periods = get_periods_per_year(self.dates, self.returns)
+        self.rolling_volatility = rolling_volatility(self.returns, window, periods)
+        valid = ~np.isnan(self.returns)
+        count = valid.sum(axis=0)
+        excess = np.where(valid, self.returns - risk_free_rate / periods, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(valid, self.returns, 0.0).sum(axis=0) / count
+            std = np.sqrt((np.where(valid, self.returns - mean, 0.0) ** 2).sum(axis=0) / (count - 1))
+            downside = np.sqrt((np.minimum(excess, 0.0) ** 2).sum(axis=0) / count)
+            self.volatility = np.where(count > 1, std, np.nan) * np.sqrt(periods)
+            self.sharpe = (mean * periods - risk_free_rate) / self.volatility
+            self.sortino = (mean * periods - risk_free_rate) / (downside * np.sqrt(periods))
+        self.max_drawdown, self.drawdown_days = get_drawdowns(self.dates, prices)
+        self.beta = get_betas(self.returns, self.returns[:, self.symbols.index(self.benchmark)]) \
+            if self.benchmark else np.full(len(self.symbols), np.nan)
+        self.correlation = correlation_matrix(self.returns)
+
+    def get_latest_rolling_volatility(self) -> np.ndarray:
+        rows = np.where(~np.isnan(self.rolling_volatility), np.arange(len(self.dates))[:, None], -1).max(axis=0)
+        return np.where(rows >= 0, self.rolling_volatility[np.maximum(rows, 0), np.arange(len(self.symbols))], np.nan)
+
+    def to_dict(self) -> dict:
+        latest = self.get_latest_rolling_volatility()
+        return {symbol: {'volatility': float(self.volatility[idx] * 100),
+                         'rolling_volatility': float(latest[idx] * 100),
+                         'max_drawdown': float(self.max_drawdown[idx] * 100),
+                         'drawdown_days': int(self.drawdown_days[idx]),
+                         'sharpe': float(self.sharpe[idx]),
+                         'sortino': float(self.sortino[idx]),
+                         'beta': float(self.beta[idx])}
+                for idx, symbol in enumerate(self.symbols)}
+
+    def get_correlation_dict(self) -> dict:
+        return {symbol: {other: float(self.correlation[row, col]) for col, other in enumerate(self.symbols)}
+                for row, symbol in enumerate(self.symbols)}
+
+    def get_rolling_rows(self) -> list[dict]:
+        return [dict({'date': date.fromordinal(int(ordinal)).strftime('%Y-%m-%d')},
+                     **{symbol: float(value) for symbol, value in zip(self.symbols, row)})
+                for ordinal, row in zip(self.dates, self.rolling_volatility * 100)]
@@ -0,0 +1,67 @@
+import numpy as np
+from src.transactions import TransactionColumns, TransType
+
+ROLLUP_METRICS = ('trades', 'value', 'spending', 'proceeds', 'fees', 'fx_fees', 'pnl', 'fee_drag')
+
+class RollupKey:
+    WALLET = 'wallet'
+    EXCHANGE = 'exchange'
+    CURRENCY = 'currency'
+
+def group_by(keys: list[np.ndarray], sizes: list[int],
+             values: dict[str, np.ndarray]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    combined = np.zeros(len(keys[0]) if keys else 0, dtype=np.int64)
+    for codes, size in zip(keys, sizes):
+        combined = combined * size + codes
+    groups, inverse = np.unique(combined, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = {name: np.bincount(inverse, weights=column, minlength=len(groups))
+            for name, column in values.items()}
+    group_keys = np.empty((len(groups), len(keys)), dtype=np.int64)
+    remainder = groups
+    for idx in range(len(keys) - 1, -1, -1):
+        group_keys[:, idx] = remainder % sizes[idx]
+        remainder = remainder // sizes[idx]
+    return group_keys, sums
+
+class Rollups:
+
+    def __init__(self, columns: TransactionColumns, prices: np.ndarray) -> None:
+        is_buy = columns.types == TransType.BUY
+        is_sell = columns.types == TransType.SELL
+        signed_quantity = np.where(is_buy, columns.quantity, np.where(is_sell, -columns.quantity, 0.0))
+        is_trade = is_buy | is_sell
+        self.names = {RollupKey.WALLET: columns.wallets, RollupKey.EXCHANGE: columns.exchanges,
+                      RollupKey.CURRENCY: columns.currencies}
+        self.keys, self.aggregates = group_by(
+            [columns.wallet_codes, columns.exchange_codes, columns.currency_codes],
+            [len(columns.wallets), len(columns.exchanges), len(columns.currencies)],
+            {'trades': is_trade.astype(np.float64),
+             'value': signed_quantity * prices[columns.codes] if len(columns) else np.zeros(0),
+             'spending': np.where(is_buy, columns.spending, 0.0),
+             'proceeds': np.where(is_sell, columns.proceeds, 0.0),
+             'fees': np.where(is_trade, columns.fees, 0.0),
+             'fx_fees': np.where(is_trade, columns.fx_fees, 0.0)})
+
+    def get(self, key: str) -> dict:
+        dimension = (RollupKey.WALLET, RollupKey.EXCHANGE, RollupKey.CURRENCY).index(key)
+        names = self.names[key]
+        totals = {name: np.bincount(self.keys[:, dimension], weights=column, minlength=len(names))
+                  for name, column in self.aggregates.items()}
+        pnl = totals['value'] + totals['proceeds'] - totals['spending']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drag = np.where(totals['spending'] > 0,
+                            (totals['fees'] + totals['fx_fees']) / totals['spending'] * 100, 0.0)
+        return {name: {'trades': int(totals['trades'][idx]), 'value': float(totals['value'][idx]),
+                       'spending': float(totals['spending'][idx]),
+                       'proceeds': float(totals['proceeds'][idx]), 'fees': float(totals['fees'][idx]),
+                       'fx_fees': float(totals['fx_fees'][idx]), 'pnl': float(pnl[idx]),
+                       'fee_drag': float(drag[idx])}
+                for idx, name in enumerate(names)}
+
+    def to_dict(self) -> dict:
+        return {key: self.get(key) for key in self.names}
+
+    def to_rows(self) -> list[dict]:
+        return [dict({'group': key, 'name': name}, **metrics)
+                for key, rollup in self.to_dict().items() for name, metrics in rollup.items()]
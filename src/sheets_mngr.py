@@ -1,21 +1,122 @@
 import os
+import json
+import hashlib
 import requests
+from typing import Optional
+from requests.adapters import HTTPAdapter
+
+DOWNLOAD_TIMEOUT = 30.0
+CHUNK_SIZE = 1 << 16
+
+class SheetDownload:
+
+    def __init__(self, filepath: str, changed: bool, digest: Optional[str]=None) -> None:
+        self.filepath = filepath
+        self.changed = changed
+        self.digest = digest
+
+class SheetDownloader:
+
+    def __init__(self, timeout: float=DOWNLOAD_TIMEOUT, pool_size: int=4) -> None:
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.downloads = {}
+
+    @staticmethod
+    def get_meta_file(filepath: str) -> str:
+        return f'{filepath}.meta.json'
+
+    def load_meta(self, filepath: str) -> dict:
+        meta_file = self.get_meta_file(filepath)
+        if not os.path.exists(filepath) or not os.path.exists(meta_file):
+            return {}
+        with open(meta_file, mode='r') as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError:
+                return {}
+
+    def save_meta(self, filepath: str, meta: dict) -> None:
+        meta_file = self.get_meta_file(filepath)
+        with open(f'{meta_file}.tmp', mode='w') as file:
+            json.dump(meta, file)
+        os.replace(f'{meta_file}.tmp', meta_file)
+
+    def download(self, url: str, filepath: str) -> SheetDownload:
+        meta = self.load_meta(filepath)
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                response.raw.drain_conn()
+                return self.record(SheetDownload(filepath, False, meta.get('sha256')))
+            if response.status_code != 200:
+                response.raw.drain_conn()
+                print(f'Error downloading Google Sheet: {response.status_code}')
+                raise Exception(f'Error downloading Google Sheet: {response.status_code}')
+            hasher = hashlib.sha256()
+            tmp_file = f'{filepath}.tmp'
+            try:
+                with open(tmp_file, mode='wb') as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        hasher.update(chunk)
+                        file.write(chunk)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+            changed = hasher.hexdigest() != meta.get('sha256')
+            if changed:
+                os.replace(tmp_file, filepath)
+            else:
+                os.remove(tmp_file)
+            self.save_meta(filepath, {'etag': response.headers.get('ETag'),
+                                      'last_modified': response.headers.get('Last-Modified'),
+                                      'sha256': hasher.hexdigest()})
+        return self.record(SheetDownload(filepath, changed, hasher.hexdigest()))
+
+    def record(self, download: SheetDownload) -> SheetDownload:
+        self.downloads[download.filepath] = download
+        return download
+
+    def is_changed(self, filepath: Optional[str]=None) -> bool:
+        if filepath is not None:
+            return self.downloads[filepath].changed if filepath in self.downloads else True
+        return any(download.changed for download in self.downloads.values())
+
+    def get_digest(self, filepath: str) -> Optional[str]:
+        return self.downloads[filepath].digest if filepath in self.downloads else None
+
+DOWNLOADER = None
+
+def get_downloader() -> SheetDownloader:
+    global DOWNLOADER
+    if DOWNLOADER is None:
+        DOWNLOADER = SheetDownloader()
+    return DOWNLOADER
+
+def is_sheet_changed(filepath: Optional[str]=None) -> bool:
+    return DOWNLOADER is None or DOWNLOADER.is_changed(filepath)
+
+def get_sheet_digest(filepath: str) -> Optional[str]:
+    return DOWNLOADER.get_digest(filepath) if DOWNLOADER else None
+
+def get_sheet_url(spreadsheet_id: str) -> str:
+    if Sheets.is_url(spreadsheet_id):
+        return f'{spreadsheet_id}'
+    return f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv'
 
 def get_google_sheet(spreadsheet_id: str, outDir: str,
                      outFile: str) -> os.PathLike:
     os.makedirs(outDir, exist_ok = True)
-    url = f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv'
-    if Sheets.is_url(spreadsheet_id):
-        url = f'{spreadsheet_id}'
-    response = requests.get(url)
-    if response.status_code == 200:
-        filepath = os.path.join(outDir, outFile)
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-        return filepath
-    else:
-        print(f'Error downloading Google Sheet: {response.status_code}')
-        raise Exception(f'Error downloading Google Sheet: {response.status_code}')
+    return get_downloader().download(get_sheet_url(spreadsheet_id), os.path.join(outDir, outFile)).filepath
 
 class Sheets:
 
@@ -0,0 +1,107 @@
+import calendar
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Optional
+from src.frame_mngr import PriceFrame
+from src.valuation_mngr import NavSeries, fill_forward
+
+DAYS_PER_YEAR = 365.0
+STEPS_PER_YEAR = 12
+BATCH_SIZE = 1024
+PERCENTILES = (5, 25, 50, 75, 95)
+
+class SimulationMethod:
+    BOOTSTRAP = 'bootstrap'
+    NORMAL = 'normal'
+
+SIMULATION_METHODS = (SimulationMethod.BOOTSTRAP, SimulationMethod.NORMAL)
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def get_step_returns(dates: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    filled = fill_forward(prices)
+    start = int(np.argmax((~np.isnan(filled)).all(axis=1)))
+    filled = filled[start:]
+    if len(filled) < 2 or np.isnan(filled[0]).any() or (filled <= 0).any():
+        return np.zeros((0, prices.shape[1]))
+    span = max(float(dates[-1] - dates[start]), 1.0) / DAYS_PER_YEAR
+    step_rows = max(int(round((len(filled) - 1) / span / STEPS_PER_YEAR)), 1)
+    if len(filled) <= step_rows:
+        return np.zeros((0, prices.shape[1]))
+    log_prices = np.log(filled)
+    return log_prices[step_rows:] - log_prices[:-step_rows]
+
+def simulate_batch(task: tuple) -> np.ndarray:
+    seed, paths, steps, method, source, weights = task
+    rng = np.random.default_rng(seed)
+    if method == SimulationMethod.BOOTSTRAP:
+        draws = source[rng.integers(0, len(source), size=(paths, steps))]
+    else:
+        mean, covariance = source
+        draws = rng.multivariate_normal(mean, covariance, size=(paths, steps), method='eigh')
+    np.cumsum(draws, axis=1, out=draws)
+    np.exp(draws, out=draws)
+    return (draws @ weights).T
+
+class SimulationResult:
+
+    def __init__(self, start: date, start_value: float, values: np.ndarray,
+                 method: str, seed: int) -> None:
+        self.dates = [add_months(start, step) for step in range(values.shape[0] + 1)]
+        self.start_value = start_value
+        self.paths = values.shape[1]
+        self.method = method
+        self.seed = seed
+        bands = np.percentile(values, PERCENTILES, axis=1)
+        self.bands = np.column_stack([np.full(len(PERCENTILES), start_value), bands])
+
+    def to_rows(self) -> list[dict]:
+        return [dict({'date': day.strftime('%Y-%m-%d')},
+                     **{f'p{percentile}': float(value)
+                        for percentile, value in zip(PERCENTILES, self.bands[:, idx])})
+                for idx, day in enumerate(self.dates)]
+
+    def get_yearly_rows(self) -> list[dict]:
+        return self.to_rows()[::STEPS_PER_YEAR]
+
+def run_batches(tasks: list[tuple], workers: int) -> list[np.ndarray]:
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(simulate_batch, tasks,
+                                     chunksize=max(len(tasks) // (workers * 4), 1)))
+    return [simulate_batch(task) for task in tasks]
+
+def simulate_portfolio(frame: Optional[PriceFrame], nav: NavSeries, paths: int,
+                       years: float=10.0, method: str=SimulationMethod.BOOTSTRAP,
+                       seed: int=0, workers: int=0,
+                       batch_size: int=BATCH_SIZE) -> Optional[SimulationResult]:
+    if method not in SIMULATION_METHODS:
+        raise ValueError(f'Unsupported simulation method: {method}')
+    if frame is None or not len(frame.dates) or not len(nav) or paths <= 0:
+        return None
+    columns = [idx for idx, symbol in enumerate(nav.symbols)
+               if frame.has_symbol(symbol) and nav.values[-1, idx] > 0]
+    if not columns:
+        return None
+    weights = nav.values[-1, columns]
+    prices = np.take(frame.values, [frame.symbol_index[nav.symbols[idx]] for idx in columns], axis=1)
+    step_returns = get_step_returns(frame.dates, prices)
+    if len(step_returns) < 2:
+        return None
+    if method == SimulationMethod.BOOTSTRAP:
+        source = step_returns
+    else:
+        source = (step_returns.mean(axis=0), np.atleast_2d(np.cov(step_returns, rowvar=False)))
+    steps = max(int(round(years * STEPS_PER_YEAR)), 1)
+    sizes = [batch_size] * (paths // batch_size) + ([paths % batch_size] if paths % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(batch_seed, size, steps, method, source, weights)
+             for batch_seed, size in zip(seeds, sizes)]
+    values = np.hstack(run_batches(tasks, workers))
+    return SimulationResult(date.fromordinal(int(nav.dates[-1])), float(weights.sum()),
+                            values, method, seed)
@@ -1,11 +1,16 @@
 import os
+import sys
+import bisect
+import hashlib
 import pathlib
-from datetime import datetime
-from typing import List, Optional
+import numpy as np
+from enum import IntEnum
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple, Union
 from src.csv_mngr import CsvMngr
 from src.sheets_mngr import get_google_sheet
 
-class TransType:
+class TransType(IntEnum):
     WATCH = 0
     BUY = 1
     SELL = 2
@@ -14,34 +19,98 @@ class TransType:
     DEPOSIT = 5
     WITHDRAW = 6
 
+    @classmethod
+    def from_str(cls, name: str) -> 'TransType':
+        try:
+            return cls[name.strip().upper()]
+        except KeyError:
+            raise ValueError(f'Unsupported transaction type: {name}')
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+    def is_cash(self) -> bool:
+        return self in (TransType.DEPOSIT, TransType.WITHDRAW, TransType.TRANSFER, TransType.CONVERT)
+
+
+def parse_positive(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise ValueError(f'must be positive: {value!r}')
+    return number
+
+TRANSACTION_HEADERS = ["type", "date", "quantity", "fees", "price",
+                       "currency", "symbol", "exchange", "platform",
+                       "ex_rate", "ex_fees"]
+TRANSACTION_CONVERTERS = {"type": TransType.from_str, "date": date.fromisoformat,
+                          "quantity": float, "fees": float, "price": float,
+                          "ex_rate": parse_positive, "ex_fees": float}
+TRANSACTION_DEFAULTS = {"fees": "0", "ex_rate": "1", "ex_fees": "0"}
+TRANSACTION_ALIASES = {"platform": ("wallet",)}
+
+LEDGER_CODES = ('type', 'date', 'currency', 'symbol', 'exchange', 'wallet')
+LEDGER_NUMBERS = ('quantity', 'fees', 'price', 'ex_rate', 'ex_fees')
 
 class Transaction:
+    __slots__ = ('type', 'date', 'quantity', 'fees', 'price', 'currency',
+                 'symbol', 'exchange', 'wallet', 'ex_rate', 'ex_fees')
+
     def __init__(self, transaction: dict) -> None:
-        self.type = transaction["type"]
-        self.date = transaction["date"]
+        self.type = TransType.from_str(transaction["type"])
+        self.date = datetime.strptime(transaction["date"], "%Y-%m-%d").date()
         self.quantity = float(transaction["quantity"])
         self.fees = float(transaction["fees"])
         self.price = float(transaction["price"])
-        self.currency = transaction["currency"]
-        self.symbol = transaction["symbol"]
-        self.exchange = transaction["exchange"]
+        self.currency = sys.intern(transaction["currency"])
+        self.symbol = sys.intern(transaction["symbol"])
+        self.exchange = sys.intern(transaction["exchange"])
         try:
-            self.wallet = transaction["platform"]
+            self.wallet = sys.intern(transaction["platform"])
         except KeyError:
-            self.wallet = transaction["wallet"]
+            self.wallet = sys.intern(transaction["wallet"])
         self.ex_rate = float(transaction["ex_rate"])
         self.ex_fees = float(transaction["ex_fees"])
 
+    @classmethod
+    def from_record(cls, record: dict) -> 'Transaction':
+        transaction = cls.__new__(cls)
+        transaction.type = record["type"]
+        transaction.date = record["date"]
+        transaction.quantity = record["quantity"]
+        transaction.fees = record["fees"]
+        transaction.price = record["price"]
+        transaction.currency = sys.intern(record["currency"])
+        transaction.symbol = sys.intern(record["symbol"])
+        transaction.exchange = sys.intern(record["exchange"])
+        transaction.wallet = sys.intern(record["platform"] if "platform" in record else record["wallet"])
+        transaction.ex_rate = record["ex_rate"]
+        transaction.ex_fees = record["ex_fees"]
+        return transaction
+
     def __str__(self) -> str:
         return f"{self.type} {self.quantity} {self.exchange}::{self.symbol} " + \
                f"at {self.price} {self.currency} " + \
                f"with extra {self.fees}, {self.ex_rate} and {self.ex_fees} " + \
                f"on {self.date} to {self.wallet}"
 
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def get_spending(self) -> float:
+        return (self.price * self.quantity + self.fees + self.ex_fees) / self.ex_rate
+
+    def get_proceeds(self) -> float:
+        return (self.price * self.quantity - self.fees - self.ex_fees) / self.ex_rate
+
+    def get_key(self) -> str:
+        return f"{self.type}|{self.date}|{self.quantity!r}|{self.fees!r}|{self.price!r}|" + \
+               f"{self.currency}|{self.symbol}|{self.exchange}|{self.wallet}|" + \
+               f"{self.ex_rate!r}|{self.ex_fees!r}"
+
     def __dict__(self) -> dict:
         return {
-            "type": self.type,
-            "date": self.date,
+            "type": str(self.type),
+            "date": self.date.strftime("%Y-%m-%d"),
             "quantity": self.quantity,
             "fees": self.fees,
             "price": self.price,
@@ -53,81 +122,250 @@ class Transaction:
             "ex_fees": self.ex_fees
         }
 
+def factorize(names: List[str]) -> Tuple[List[str], np.ndarray]:
+    unique_names, first_index, inverse = np.unique(np.array(names, dtype=object), return_index=True,
+                                                   return_inverse=True)
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    codes = rank[inverse.reshape(-1)] if len(names) else np.zeros(0, dtype=np.int64)
+    return [str(name) for name in unique_names[order]], codes
+
+class TransactionColumns:
+    def __init__(self, transactions: List[Transaction]) -> None:
+        count = len(transactions)
+        self.symbols, self.codes = factorize([transaction.symbol for transaction in transactions])
+        self.wallets, self.wallet_codes = factorize([transaction.wallet for transaction in transactions])
+        self.exchanges, self.exchange_codes = factorize([transaction.exchange for transaction in transactions])
+        self.currencies, self.currency_codes = factorize([transaction.currency.upper()
+                                                          for transaction in transactions])
+        self.types = np.fromiter((transaction.type for transaction in transactions), dtype=np.int8, count=count)
+        self.ordinals = np.fromiter((transaction.date.toordinal() for transaction in transactions),
+                                    dtype=np.int64, count=count)
+        self.quantity = np.fromiter((transaction.quantity for transaction in transactions),
+                                    dtype=np.float64, count=count)
+        self.spending = np.fromiter((transaction.get_spending() for transaction in transactions),
+                                    dtype=np.float64, count=count)
+        self.proceeds = np.fromiter((transaction.get_proceeds() for transaction in transactions),
+                                    dtype=np.float64, count=count)
+        self.fees = np.fromiter((transaction.fees / transaction.ex_rate for transaction in transactions),
+                                dtype=np.float64, count=count)
+        self.fx_fees = np.fromiter((transaction.ex_fees / transaction.ex_rate for transaction in transactions),
+                                   dtype=np.float64, count=count)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
 class Transactions:
     def __init__(self) -> None:
         self.transactions = []
+        self.is_indexed = False
+        self.month_index = {}
+        self.symbol_index = {}
+        self.date_index = {}
+        self.sorted_ordinals = []
+        self.sorted_positions = []
+        self.columns = None
+        self.errors = []
 
     def add(self, transaction: Transaction) -> None:
         self.transactions.append(transaction)
+        self.is_indexed = False
 
     def add_list(self, transactions: List[Transaction]) -> None:
         for transaction in transactions:
             transaction = Transaction(transaction)
             self.transactions.append(transaction)
+        self.is_indexed = False
+
+    def add_records(self, records: Iterable[dict]) -> None:
+        self.transactions.extend(Transaction.from_record(record) for record in records)
+        self.is_indexed = False
 
     def get(self) -> list:
         return self.transactions
 
     def remove(self, index: int) -> None:
         self.transactions.pop(index)
+        self.is_indexed = False
 
     def clear(self) -> None:
         self.transactions.clear()
+        self.is_indexed = False
 
     def update(self, index: int, transaction: Transaction) -> None:
         self.transactions[index] = transaction
+        self.is_indexed = False
 
-    def get_transactions_date(self, date: datetime) -> List[Transaction]:
-        transactions_date = []
-        for transaction in self.transactions:
-            if transaction.date == date:
-                transactions_date.append(transaction)
-        return transactions_date
+    def build_index(self) -> None:
+        self.month_index = {}
+        self.symbol_index = {}
+        self.date_index = {}
+        ordinals = []
+        for position, transaction in enumerate(self.transactions):
+            ordinal = transaction.date.toordinal()
+            ordinals.append(ordinal)
+            self.month_index.setdefault((transaction.date.year, transaction.date.month), []).append(position)
+            self.symbol_index.setdefault(transaction.symbol, []).append(position)
+            self.date_index.setdefault(ordinal, []).append(position)
+        self.sorted_positions = sorted(range(len(ordinals)), key=ordinals.__getitem__)
+        self.sorted_ordinals = [ordinals[position] for position in self.sorted_positions]
+        self.columns = None
+        self.is_indexed = True
 
-    def get_transactions_month(self, date: datetime) -> List[dict]:
-        transactions_month = []
-        for transaction in self.transactions:
-            transaction_date = datetime.strptime(transaction.date, "%Y-%m-%d").date()
-            if transaction_date.month == date.month and transaction_date.year == date.year:
-                transactions_month.append(transaction.__dict__())
-        return transactions_month
+    def ensure_index(self) -> None:
+        if not self.is_indexed:
+            self.build_index()
+
+    def get_columns(self) -> TransactionColumns:
+        self.ensure_index()
+        if self.columns is None:
+            self.columns = TransactionColumns([transaction for transaction in self.transactions
+                                               if not transaction.type.is_cash()])
+        return self.columns
+
+    def get_sorted(self) -> List[Transaction]:
+        self.ensure_index()
+        return [self.transactions[position] for position in self.sorted_positions]
+
+    def get_transactions_date(self, date: Union[str, date, datetime]) -> List[Transaction]:
+        self.ensure_index()
+        if isinstance(date, str):
+            date = datetime.strptime(date, "%Y-%m-%d")
+        if isinstance(date, datetime):
+            date = date.date()
+        return [self.transactions[position] for position in self.date_index.get(date.toordinal(), [])]
+
+    def get_transactions_month(self, date: date) -> List[Transaction]:
+        self.ensure_index()
+        return [self.transactions[position]
+                for position in self.month_index.get((date.year, date.month), [])]
+
+    def get_transactions_symbol(self, symbol: str) -> List[Transaction]:
+        self.ensure_index()
+        return [self.transactions[position] for position in self.symbol_index.get(symbol, [])]
+
+    def get_transactions_range(self, start: date, end: date) -> List[Transaction]:
+        self.ensure_index()
+        first = bisect.bisect_left(self.sorted_ordinals, start.toordinal())
+        last = bisect.bisect_right(self.sorted_ordinals, end.toordinal())
+        return [self.transactions[position] for position in self.sorted_positions[first:last]]
+
+    def get_prefix_digests(self, prefix: int) -> Tuple[Optional[str], str]:
+        hasher = hashlib.sha256()
+        prefix_digest = hasher.hexdigest() if prefix == 0 else None
+        for position, transaction in enumerate(self.transactions, start=1):
+            hasher.update(transaction.get_key().encode())
+            hasher.update(b'\n')
+            if position == prefix:
+                prefix_digest = hasher.hexdigest()
+        return prefix_digest, hasher.hexdigest()
 
     def get_symbols_of_interest(self) -> list[str]:
-        symbols_of_interest = []
+        self.ensure_index()
+        return [symbol for symbol, positions in self.symbol_index.items()
+                if any(not self.transactions[position].type.is_cash() for position in positions)]
+
+    def get_cash_currencies(self) -> list[str]:
+        currencies = {}
         for transaction in self.transactions:
-            if transaction.symbol not in symbols_of_interest:
-                symbols_of_interest.append(transaction.symbol)
-        return symbols_of_interest
+            currencies[transaction.currency.upper()] = None
+            if transaction.type == TransType.CONVERT:
+                currencies[transaction.symbol.upper()] = None
+        return list(currencies)
+
+    def get_first_date(self) -> date:
+        self.ensure_index()
+        return date.fromordinal(self.sorted_ordinals[0])
+
+    def get_last_date(self) -> date:
+        self.ensure_index()
+        return date.fromordinal(self.sorted_ordinals[-1])
 
     def get_first_transaction_date(self, date_format: str='%Y-%m-%d') -> str:
-        first_transaction = min(self.transactions, key=lambda t: datetime.strptime(t.date, "%Y-%m-%d"))
-        return datetime.strptime(first_transaction.date, "%Y-%m-%d").strftime(date_format)
+        return self.get_first_date().strftime(date_format)
 
     def match_symbols_standard(self, std_map: dict) -> None:
         for transaction in self.transactions:
-            transaction.symbol = std_map.get(transaction.symbol.lower(), transaction.symbol.lower())
+            if transaction.type.is_cash():
+                continue
+            transaction.symbol = sys.intern(std_map.get(transaction.symbol.lower(), transaction.symbol.lower()))
+        self.is_indexed = False
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray, dict]:
+        count = len(self.transactions)
+        names = {}
+        codes = np.empty((len(LEDGER_CODES), count), dtype=np.int32)
+        codes[0] = np.fromiter((transaction.type for transaction in self.transactions), dtype=np.int32, count=count)
+        codes[1] = np.fromiter((transaction.date.toordinal() for transaction in self.transactions),
+                               dtype=np.int32, count=count)
+        for row, field in enumerate(LEDGER_CODES[2:], start=2):
+            names[field], codes[row] = factorize([getattr(transaction, field)
+                                                  for transaction in self.transactions])
+        numbers = np.empty((len(LEDGER_NUMBERS), count), dtype=np.float64)
+        for row, field in enumerate(LEDGER_NUMBERS):
+            numbers[row] = np.fromiter((getattr(transaction, field) for transaction in self.transactions),
+                                       dtype=np.float64, count=count)
+        return codes, numbers, names
+
+    @classmethod
+    def from_arrays(cls, codes: np.ndarray, numbers: np.ndarray, names: dict) -> 'Transactions':
+        types = {code: TransType(code) for code in np.unique(codes[0]).tolist()}
+        dates = {ordinal: date.fromordinal(ordinal) for ordinal in np.unique(codes[1]).tolist()}
+        columns = [[types[code] for code in codes[0].tolist()],
+                   [dates[ordinal] for ordinal in codes[1].tolist()]]
+        for row, field in enumerate(LEDGER_CODES[2:], start=2):
+            values = [sys.intern(name) for name in names[field]]
+            columns.append([values[code] for code in codes[row].tolist()])
+        columns += [values.tolist() for values in numbers]
+        transactions_obj = cls()
+        append = transactions_obj.transactions.append
+        for kind, day, currency, symbol, exchange, wallet, quantity, fees, price, ex_rate, ex_fees in zip(*columns):
+            transaction = Transaction.__new__(Transaction)
+            transaction.type = kind
+            transaction.date = day
+            transaction.currency = currency
+            transaction.symbol = symbol
+            transaction.exchange = exchange
+            transaction.wallet = wallet
+            transaction.quantity = quantity
+            transaction.fees = fees
+            transaction.price = price
+            transaction.ex_rate = ex_rate
+            transaction.ex_fees = ex_fees
+            append(transaction)
+        return transactions_obj
 
     def print(self) -> None:
         print("Transactions:")
         for transaction in self.transactions:
             print(transaction)
 
+def get_transactions_file(is_local: bool, address: str, directory: Optional[os.PathLike]) -> str:
+    if is_local:
+        return address
+    return get_google_sheet(address, f'{directory}', 'transactions.csv')
+
 def build_transactions_object(is_local: bool, address: str,
                               directory: Optional[os.PathLike],
                               is_quiet: bool,
-                              std_map: Optional[dict]) -> Transactions:
-    if is_local:
-        transactions_file = address
-    else:
-        transactions_file = get_google_sheet(address, f'{directory}', 'transactions.csv')
-        if not is_quiet:
-            print('CSV file saved to: {}'.format(transactions_file))
+                              std_map: Optional[dict],
+                              imports: Optional[list]=None) -> Transactions:
+    transactions_file = get_transactions_file(is_local, address, directory)
+    if not is_local and not is_quiet:
+        print('CSV file saved to: {}'.format(transactions_file))
     transactions_obj = Transactions()
-    trans_csv_obj = CsvMngr(pathlib.Path(f'{transactions_file}'),
-                      ["type", "date", "quantity", "fees", "price",
-                       "currency", "symbol", "exchange", "platform",
-                       "ex_rate", "ex_fees"])
-    transactions_obj.add_list(trans_csv_obj.read())
+    trans_csv_obj = CsvMngr(pathlib.Path(f'{transactions_file}'), TRANSACTION_HEADERS,
+                            TRANSACTION_CONVERTERS, TRANSACTION_DEFAULTS, TRANSACTION_ALIASES)
+    transactions_obj.add_records(trans_csv_obj.iter_records())
+    transactions_obj.errors = trans_csv_obj.errors
+    for result in imports if imports else []:
+        transactions_obj.add_records(result.records)
+        transactions_obj.errors += result.skipped
+    if not is_quiet:
+        for error in transactions_obj.errors:
+            print(f'Skipped transaction at {error}')
     if std_map:
         transactions_obj.match_symbols_standard(std_map)
+    transactions_obj.build_index()
     return transactions_obj
@@ -13,6 +13,9 @@ def parse_arguments() -> argparse.Namespace:
                         help='Path to the overall configuration file')
     parser.add_argument('--log-level', type=str, dest='log_level', default='info',
                         help='Log level [DEBUG | INFO | WARNING | ERROR | CRITICAL]')
+    parser.add_argument('--refresh-cache', type=str, nargs='*', dest='refresh_cache',
+                        default=None, metavar='TICKER',
+                        help='Invalidate the cached price history (all tickers if none given) before fetching')
     return parser.parse_args()
 
 def check_internet(host="8.8.8.8", port=53, timeout=3) -> bool:
@@ -42,5 +45,6 @@ def get_yaml_parameter(yaml_path: pathlib.Path,
 def get_exception(e_num: int) -> str:
     e_map = {503: 'ServiceNotAvailable',
              299: 'DeprecatedAPI',
-             417: 'UnsupportedConfiguration'}
+             417: 'UnsupportedConfiguration',
+             422: 'UnprocessableInput'}
     return e_map.get(e_num, 'NotMapped')
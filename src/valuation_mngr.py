@@ -0,0 +1,98 @@
+import numpy as np
+from datetime import date
+from typing import Optional
+from src.transactions import Transactions, TransType
+from src.frame_mngr import PriceFrame, Period, period_start_ordinals, get_month_label
+from src.lots_mngr import LotBook
+
+def fill_forward(values: np.ndarray) -> np.ndarray:
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    rows = np.where(missing, -1, np.arange(values.shape[0])[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values.ravel()[np.maximum(rows, 0) * values.shape[1] + np.arange(values.shape[1])]
+    filled[rows < 0] = np.nan
+    return filled
+
+def align_prices(frame: Optional[PriceFrame], dates: np.ndarray,
+                 symbols: list[str]) -> np.ndarray:
+    if frame is None or not len(frame.dates):
+        return np.full((len(dates), len(symbols)), np.nan)
+    columns = [idx for idx, symbol in enumerate(symbols) if frame.has_symbol(symbol)]
+    filled = fill_forward(np.take(frame.values, [frame.symbol_index[symbols[idx]] for idx in columns], axis=1))
+    rows = np.searchsorted(frame.dates, dates, side='right') - 1
+    aligned = np.take(filled, np.maximum(rows, 0), axis=0)
+    aligned[rows < 0] = np.nan
+    if len(columns) == len(symbols):
+        return aligned
+    prices = np.full((len(dates), len(symbols)), np.nan)
+    prices[:, columns] = aligned
+    return prices
+
+class NavSeries:
+
+    def __init__(self, dates: np.ndarray, symbols: list[str], holdings: np.ndarray,
+                 prices: np.ndarray, cost_basis: np.ndarray) -> None:
+        self.dates = dates
+        self.symbols = symbols
+        self.holdings = holdings
+        self.prices = prices
+        self.values = np.nan_to_num(holdings * prices, copy=False)
+        self.cost_basis = cost_basis
+        self.nav = self.values.sum(axis=1)
+        self.unrealized_pnl = self.nav - cost_basis
+        self.cash = np.zeros(len(dates))
+        self.wealth = self.nav
+
+    def set_cash(self, cash: np.ndarray) -> None:
+        self.cash = cash
+        self.wealth = self.nav + cash
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def get_period_ends(self, period: str) -> np.ndarray:
+        periods = period_start_ordinals(self.dates, period)
+        return np.flatnonzero(np.r_[periods[1:] != periods[:-1], True])
+
+    def to_monthly(self) -> dict:
+        rows = self.get_period_ends(Period.MONTH)
+        return {get_month_label(date.fromordinal(int(self.dates[row]))): float(self.nav[row])
+                for row in rows}
+
+    def to_rows(self) -> list[dict]:
+        return [{'date': date.fromordinal(int(ordinal)).strftime('%Y-%m-%d'),
+                 'nav': float(nav), 'cost_basis': float(cost), 'unrealized_pnl': float(pnl),
+                 'cash': float(cash), 'wealth': float(wealth)}
+                for ordinal, nav, cost, pnl, cash, wealth in zip(self.dates, self.nav, self.cost_basis,
+                                                                 self.unrealized_pnl, self.cash, self.wealth)]
+
+def build_nav(transactions: Transactions, frame: Optional[PriceFrame],
+              lot_book: LotBook, end_date: Optional[date]=None) -> NavSeries:
+    columns = transactions.get_columns()
+    symbols = columns.symbols
+    if not len(columns):
+        return NavSeries(np.zeros(0, dtype=np.int64), symbols, np.zeros((0, len(symbols))),
+                         np.zeros((0, len(symbols))), np.zeros(0))
+    first = int(columns.ordinals.min())
+    last = int(columns.ordinals.max())
+    if frame is not None and len(frame.dates):
+        last = max(last, int(frame.dates[-1]))
+    if end_date is not None:
+        last = max(last, end_date.toordinal())
+    dates = np.arange(first, last + 1, dtype=np.int64)
+    rows = columns.ordinals - first
+    is_buy = columns.types == TransType.BUY
+    is_sell = columns.types == TransType.SELL
+    signed_quantity = np.where(is_buy, columns.quantity, np.where(is_sell, -columns.quantity, 0.0))
+    holdings = np.bincount(rows * len(symbols) + columns.codes, weights=signed_quantity,
+                           minlength=len(dates) * len(symbols)).reshape(len(dates), len(symbols))
+    np.cumsum(holdings, axis=0, out=holdings)
+    cost_changes = np.bincount(rows[is_buy], weights=columns.spending[is_buy], minlength=len(dates))
+    if lot_book.realized:
+        sold_rows = np.fromiter((trade.ordinal - first for trade in lot_book.realized), dtype=np.int64)
+        sold_costs = np.fromiter((trade.cost for trade in lot_book.realized), dtype=np.float64)
+        cost_changes -= np.bincount(sold_rows, weights=sold_costs, minlength=len(dates))
+    cost_basis = np.cumsum(cost_changes)
+    return NavSeries(dates, symbols, holdings, align_prices(frame, dates, symbols), cost_basis)